@@ -13,7 +13,26 @@ class Settings:
     XMLSTOCK_KEY = os.getenv('XMLSTOCK_KEY', '')
         
     # База данных
-    DATABASE_URL = f"sqlite:///{BASE_DIR / 'data' / 'seo_data.db'}"
+    DATABASE_URL = os.getenv('DATABASE_URL', f"sqlite:///{BASE_DIR / 'data' / 'seo_data.db'}")
+    
+    # Хранение: сколько дней держать сырые результаты в основном файле базы
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '30'))
+    
+    # Адаптивные перепроверки: стабильные запросы проверяются реже, но не реже
+    # раза в RECHECK_MAX_STALENESS_DAYS; при волатильности топа >= порога - каждый запуск
+    ADAPTIVE_RECHECK = os.getenv('ADAPTIVE_RECHECK', '0') == '1'
+    RECHECK_MAX_STALENESS_DAYS = int(os.getenv('RECHECK_MAX_STALENESS_DAYS', '7'))
+    RECHECK_VOLATILITY_THRESHOLD = float(os.getenv('RECHECK_VOLATILITY_THRESHOLD', '0.2'))
+    RECHECK_WINDOW = 5  # сколько последних проверок учитывать в оценке
+    
+    # Отложенная запись результатов: размер пачки (запросов), макс. задержка коммита (сек)
+    # и длина очереди, при заполнении которой сбор ждет писателя
+    WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', '50'))
+    WRITE_FLUSH_INTERVAL = float(os.getenv('WRITE_FLUSH_INTERVAL', '1.0'))
+    WRITE_QUEUE_SIZE = int(os.getenv('WRITE_QUEUE_SIZE', '256'))
+    
+    # Выгружать каждую завершенную сессию в Parquet (data/parquet) для аналитики
+    PARQUET_EXPORT = os.getenv('PARQUET_EXPORT', '0') == '1'
     
     # Пути
     REPORTS_DIR = BASE_DIR / 'reports'
@@ -21,14 +40,33 @@ class Settings:
     
     # Настройки парсинга
     USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    REQUEST_DELAY = 1.0  # секунд между запросами
+    REQUEST_DELAY = 1.0  # секунд между запросами на старте (далее подстраивается AIMD)
+    PARSER_MAX_RPS = float(os.getenv('PARSER_MAX_RPS', '5'))  # верхняя граница запросов в секунду
+    PARSER_MAX_CONCURRENCY = int(os.getenv('PARSER_MAX_CONCURRENCY', '4'))  # параллельных запросов
+    PARSER_TARGET_LATENCY = float(os.getenv('PARSER_TARGET_LATENCY', '5'))  # сек; медленнее - не разгоняемся
     MAX_RESULTS_PER_QUERY = 10  # топ-10 позиций
     
+    # Отслеживаемые домены: наш сайт и конкуренты (через запятую)
+    TARGET_DOMAIN = os.getenv('TARGET_DOMAIN', 'aquamoney.by')
+    COMPETITOR_DOMAINS = [d.strip() for d in os.getenv('COMPETITOR_DOMAINS', '').split(',') if d.strip()]
+    
     # Настройки отчетов
     REPORT_TEMPLATE = "daily_table.html"
     
-    def __init__(self):
-        # Создаем необходимые директории
+    # Режим демона: время ежедневных запусков (через запятую), период отчета,
+    # минимальный интервал между сборами и управляющий сокет
+    DAEMON_SCHEDULE = os.getenv('DAEMON_SCHEDULE', '09:00')
+    DAEMON_REPORT_DAYS = int(os.getenv('DAEMON_REPORT_DAYS', '2'))
+    DAEMON_MIN_FETCH_INTERVAL = int(os.getenv('DAEMON_MIN_FETCH_INTERVAL', '3600'))  # секунд
+    DAEMON_SOCKET = BASE_DIR / 'data' / 'seo_agent.sock'
+    
+    # Локальный HTTP API (только чтение)
+    API_HOST = os.getenv('API_HOST', '127.0.0.1')
+    API_PORT = int(os.getenv('API_PORT', '8765'))
+    API_CACHE_SIZE = int(os.getenv('API_CACHE_SIZE', '256'))  # ответов в LRU кэше
+    
+    def ensure_dirs(self):
+        """Создает необходимые директории (вызывается командами, которые пишут файлы)."""
         self.REPORTS_DIR.mkdir(exist_ok=True)
         self.LOGS_DIR.mkdir(exist_ok=True)
         (BASE_DIR / 'data').mkdir(exist_ok=True)
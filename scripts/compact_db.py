@@ -0,0 +1,28 @@
+# scripts/compact_db.py
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import settings
+from src.storage.retention import RetentionManager
+
+def main():
+    """Архивирует старые сессии и компактизирует базу."""
+    print("🗄  Ротация и компактизация базы данных")
+    print("=" * 50)
+    
+    manager = RetentionManager(settings)
+    
+    stats = manager.archive_old_sessions()
+    print(f"✅ Архивировано сессий: {stats['sessions']} (строк: {stats['rows']})")
+    if stats['months']:
+        print(f"   Месяцы: {', '.join(stats['months'])}")
+    
+    sizes = manager.compact()
+    print(f"✅ Размер базы: {sizes['size_before']} -> {sizes['size_after']} байт")
+
+if __name__ == "__main__":
+    main()
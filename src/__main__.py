@@ -0,0 +1,5 @@
+# src/__main__.py - позволяет запускать CLI как `python -m src`
+import sys
+from src.main import main
+
+sys.exit(main())
@@ -0,0 +1,302 @@
+# src/analytics/similarity.py
+"""
+Сходство выдачи между сессиями: Jaccard и rank-biased overlap (RBO).
+
+Топы всех сессий кодируются в тензор целых чисел S×Q×N (сессии ×
+запросы × позиции, -1 - пустая позиция), после чего сходство считается
+векторно в NumPy, блоками по запросам, без циклов Python по парам списков.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from src.records import SessionFrame, ValueTable
+from src.storage.database import Database
+
+RBO_P = 0.9             # "терпение" RBO: вес глубины d равен p^(d-1)
+QUERY_CHUNK = 1024      # запросов в блоке для последовательных сравнений
+PAIRWISE_CHUNK = 256    # запросов в блоке для матриц S×S
+RBO_FEATURES_BUDGET = 1 << 24   # элементов float32 в матрице признаков RBO (64 МБ)
+
+class SerpTensor:
+    """Закодированные топы сессий (сессии по возрастанию даты)."""
+
+    def __init__(self, ids: np.ndarray, session_ids: List[int], queries: List[str],
+                 vocabulary: List[str], session_dates: Optional[List[str]] = None):
+        self.ids = ids
+        self.session_ids = session_ids
+        self.session_dates = session_dates or [None] * len(session_ids)
+        self.queries = queries
+        self.vocabulary = vocabulary
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.ids.shape
+
+def encode_frames(frames: List[SessionFrame], queries: Optional[List[str]] = None,
+                  top_n: int = 10, key: str = 'url') -> SerpTensor:
+    """
+    Кодирует фреймы сессий в тензор S×Q×N.
+
+    Args:
+        frames: фреймы сессий в хронологическом порядке
+        queries: запросы (по умолчанию - все встреченные во фреймах)
+        top_n: глубина топа
+        key: 'url' или 'domain' - что считать элементом списка
+    """
+    if queries is None:
+        queries = list(dict.fromkeys(q for frame in frames for q in frame.queries))
+    query_index = {query: i for i, query in enumerate(queries)}
+
+    vocab_index: Dict[str, int] = {}
+    # Таблица URL обычно общая для всех фреймов (SerpSimilarity.load) -
+    # тогда строки перекодируются один раз, а строки фреймов - индексированием
+    url_codes: Dict[int, np.ndarray] = {}
+
+    def encode(values: List[str]) -> np.ndarray:
+        """Коды таблицы значений в общем словаре (новые значения дописываются)."""
+        return np.fromiter((vocab_index.setdefault(v, len(vocab_index)) for v in values),
+                           dtype=np.int32, count=len(values))
+
+    ids = np.full((len(frames), len(queries), top_n), -1, dtype=np.int32)
+    for s, frame in enumerate(frames):
+        if not len(frame):
+            continue
+        # Идентификаторы фрейма -> строки тензора и общий словарь через таблицы поиска
+        query_remap = np.array([query_index.get(q, -1) for q in frame.queries], dtype=np.int64)
+        rows = query_remap[np.frombuffer(frame.query_id, dtype=np.uint32)]
+        positions = np.frombuffer(frame.position, dtype=np.uint16).astype(np.int64) - 1
+        if key == 'domain':
+            values = encode(frame.domains)[np.frombuffer(frame.domain_id, dtype=np.uint32)]
+        else:
+            table = frame.url_table
+            codes = url_codes.get(id(table))
+            if codes is None or len(codes) < len(table):
+                codes = url_codes[id(table)] = encode(table.values)
+            values = codes[np.frombuffer(frame.url_id, dtype=np.uint32)]
+
+        keep = (rows >= 0) & (positions >= 0) & (positions < top_n)
+        ids[s, rows[keep], positions[keep]] = values[keep]
+
+    if key == 'domain':
+        _drop_repeats(ids)
+    return SerpTensor(ids, [frame.session_id for frame in frames], queries, list(vocab_index))
+
+def _drop_repeats(ids: np.ndarray):
+    """Повторы элемента в одном списке (домен на нескольких позициях) -> -1, кроме первого."""
+    top_n = ids.shape[-1]
+    earlier = np.tril(np.ones((top_n, top_n), dtype=bool), k=-1)
+    for start in range(0, ids.shape[1], QUERY_CHUNK):
+        block = ids[:, start:start + QUERY_CHUNK]
+        repeats = ((block[..., :, None] == block[..., None, :]) & earlier).any(-1)
+        block[repeats & (block >= 0)] = -1
+
+def _matches(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Матрица совпадений ...×N×N: элемент i списка a равен элементу j списка b."""
+    return (a[..., :, None] == b[..., None, :]) & (a[..., :, None] >= 0)
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Jaccard по последней оси для списков без повторов (NaN, если оба списка пусты).
+    """
+    intersection = _matches(a, b).sum(axis=(-2, -1))
+    union = (a >= 0).sum(-1) + (b >= 0).sum(-1) - intersection
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(union > 0, intersection / np.maximum(union, 1), np.nan).astype(np.float32)
+
+def _rbo_weights(depth: int, p: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Веса глубин (1-p)·p^(d-1)/d и нормировка по длине списка L:
+    RBO списка длины L с самим собой (индекс 0 - пустой список).
+    """
+    d = np.arange(1, depth + 1)
+    weights = (1 - p) * p ** (d - 1) / d
+    lengths = np.arange(depth + 1)[:, None]
+    norm = (weights * np.minimum(d, lengths)).sum(-1)
+    norm[0] = np.nan
+    return weights, norm
+
+def rbo(a: np.ndarray, b: np.ndarray, p: float = RBO_P) -> np.ndarray:
+    """
+    Усеченный rank-biased overlap по последней оси: совпадения в начале топа
+    весят больше. Нормирован так, что одинаковые списки любой длины дают 1.
+
+    Пересечение префиксов длины d - диагональ кумулятивных сумм матрицы
+    совпадений по обеим осям.
+    """
+    weights, norm = _rbo_weights(a.shape[-1], p)
+    overlap = _matches(a, b).cumsum(-1, dtype=np.int16).cumsum(-2, dtype=np.int16)
+    overlap = np.diagonal(overlap, axis1=-2, axis2=-1)             # ...×N: |a[:d] ∩ b[:d]|
+    longest = np.maximum((a >= 0).sum(-1), (b >= 0).sum(-1))
+    return ((overlap * weights).sum(-1) / norm[longest]).astype(np.float32)
+
+METRICS = {'jaccard': jaccard, 'rbo': rbo}
+
+def consecutive_similarity(ids: np.ndarray, metric: str = 'jaccard') -> np.ndarray:
+    """
+    Сходство каждой сессии с предыдущей: (S-1)×Q, NaN - нет данных в одной из сессий.
+    """
+    func = METRICS[metric]
+    sessions, queries, _ = ids.shape
+    result = np.full((max(sessions - 1, 0), queries), np.nan, dtype=np.float32)
+    for start in range(0, queries, QUERY_CHUNK):
+        block = ids[:, start:start + QUERY_CHUNK]
+        similarity = func(block[:-1], block[1:])
+        # Пустой список с одной стороны - запрос не проверялся, а не "выдача сменилась"
+        missing = ((block[:-1] >= 0).sum(-1) == 0) | ((block[1:] >= 0).sum(-1) == 0)
+        similarity[missing] = np.nan
+        result[:, start:start + QUERY_CHUNK] = similarity
+    return result
+
+def _local_ranks(block: np.ndarray) -> np.ndarray:
+    """
+    Позиции элементов в локальном словаре каждого запроса: K×S×V (N - элемента нет).
+
+    V - число разных элементов запроса за все сессии (обычно десятки),
+    поэтому сравнение всех пар сессий сводится к умножению матриц S×V.
+    """
+    keywords, sessions, depth = block.shape
+    valid = block >= 0
+    keyword_idx = np.broadcast_to(np.arange(keywords)[:, None, None], block.shape)[valid]
+    session_idx = np.broadcast_to(np.arange(sessions)[None, :, None], block.shape)[valid]
+    position_idx = np.broadcast_to(np.arange(depth)[None, None, :], block.shape)[valid]
+
+    # Уникальные пары (запрос, элемент) -> номер элемента внутри запроса
+    keyed = (keyword_idx.astype(np.int64) << 32) | block[valid].astype(np.int64)
+    unique, inverse = np.unique(keyed, return_inverse=True)
+    first = np.searchsorted(unique >> 32, np.arange(keywords))
+    local = inverse.ravel() - first[keyword_idx]
+
+    vocab_size = int(local.max()) + 1 if len(local) else 1
+    ranks = np.full((keywords, sessions, vocab_size), depth, dtype=np.int16)
+    ranks[keyword_idx, session_idx, local] = position_idx
+    return ranks
+
+def _pairwise_block(block: np.ndarray, metric: str, p: float = RBO_P) -> np.ndarray:
+    """Матрицы S×S для блока K×S×N."""
+    depth = block.shape[-1]
+    ranks = _local_ranks(block)
+    present = (ranks < depth).astype(np.float32)
+    sizes = present.sum(-1)
+    both_empty = (sizes[:, :, None] == 0) & (sizes[:, None, :] == 0)
+
+    if metric == 'jaccard':
+        intersection = present @ present.transpose(0, 2, 1)
+        union = sizes[:, :, None] + sizes[:, None, :] - intersection
+        score = intersection / np.maximum(union, 1)
+    elif metric == 'rbo':
+        # Σ_d w_d·|a[:d] ∩ b[:d]| - одно умножение матриц по признакам (элемент, d)
+        # со значением sqrt(w_d)·[позиция < d] вместо depth умножений по префиксам
+        weights, norm = _rbo_weights(depth, p)
+        scale = np.sqrt(weights).astype(np.float32)
+        keywords, sessions, vocab_size = ranks.shape
+        step = max(1, RBO_FEATURES_BUDGET // (sessions * vocab_size * depth))
+        score = np.empty(both_empty.shape, dtype=np.float32)
+        for start in range(0, keywords, step):
+            features = (ranks[start:start + step, :, :, None] < np.arange(1, depth + 1)) * scale
+            features = features.reshape(features.shape[0], sessions, vocab_size * depth)
+            score[start:start + step] = features @ features.transpose(0, 2, 1)
+        longest = np.maximum(sizes[:, :, None], sizes[:, None, :]).astype(np.int64)
+        with np.errstate(invalid='ignore'):
+            score = score / norm[longest]
+    else:
+        raise KeyError(metric)
+    return np.where(both_empty, np.nan, score).astype(np.float32)
+
+def pairwise_similarity(ids: np.ndarray, metric: str = 'jaccard',
+                        chunk: int = PAIRWISE_CHUNK) -> Iterator[Tuple[slice, np.ndarray]]:
+    """
+    Матрицы S×S всех пар сессий по каждому запросу, блоками запросов.
+
+    Yields:
+        (срез запросов, массив K×S×S)
+    """
+    for start in range(0, ids.shape[1], chunk):
+        block = ids[:, start:start + chunk].transpose(1, 0, 2)      # K×S×N
+        yield slice(start, start + block.shape[0]), _pairwise_block(block, metric)
+
+def keyword_matrix(ids: np.ndarray, query_index: int, metric: str = 'jaccard') -> np.ndarray:
+    """Матрица S×S сходства сессий по одному запросу."""
+    return _pairwise_block(ids[:, query_index:query_index + 1].transpose(1, 0, 2), metric)[0]
+
+def detect_serp_updates(similarity: np.ndarray, window: int = 7, threshold: float = 3.0,
+                        min_drop: float = 0.05) -> List[Dict]:
+    """
+    Поиск "апдейтов" выдачи: переходов, где среднее по запросам сходство
+    с предыдущей сессией резко ниже обычного.
+
+    Обычный уровень - медиана предыдущих window переходов, разброс - MAD.
+
+    Args:
+        similarity: (S-1)×Q из consecutive_similarity
+        window: сколько предыдущих переходов берется за базу
+        threshold: порог отклонения в единицах MAD
+        min_drop: минимальное падение сходства, чтобы считать апдейтом
+
+    Returns:
+        По одному словарю на переход: {'index', 'mean_similarity', 'baseline', 'score', 'update'}
+    """
+    counts = np.isfinite(similarity).sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        means = np.where(counts > 0, np.nansum(similarity, axis=1) / np.maximum(counts, 1), np.nan)
+
+    transitions = []
+    for i, mean in enumerate(means):
+        history = means[max(0, i - window):i]
+        history = history[np.isfinite(history)]
+        baseline = score = None
+        update = False
+        if np.isfinite(mean) and len(history) >= 3:
+            baseline = float(np.median(history))
+            mad = 1.4826 * float(np.median(np.abs(history - baseline)))
+            drop = baseline - float(mean)
+            score = drop / max(mad, 1e-3)
+            update = drop >= min_drop and score >= threshold
+        transitions.append({
+            'index': i + 1,
+            'mean_similarity': None if not np.isfinite(mean) else round(float(mean), 4),
+            'baseline': None if baseline is None else round(baseline, 4),
+            'score': None if score is None else round(score, 2),
+            'update': update,
+        })
+    return transitions
+
+class SerpSimilarity:
+    """Загрузка сессий из базы и сходство выдачи по ним."""
+
+    def __init__(self, settings, db: Optional[Database] = None):
+        self.settings = settings
+        self.db = db or Database(settings)
+        self.logger = logging.getLogger(__name__)
+
+    def load(self, sessions: int = 90, queries: Optional[List[str]] = None,
+             top_n: int = 10, key: str = 'url', region: Optional[int] = None) -> SerpTensor:
+        """
+        Кодирует последние sessions завершенных сессий (включая архивные) в тензор.
+
+        Выдача разных регионов несравнима, а недособранная сессия выглядела бы
+        как смена выдачи - поэтому берутся только завершенные сессии одного
+        региона (по умолчанию - региона последней завершенной сессии).
+        """
+        completed = self.db.get_completed_sessions()
+        if region is None and completed:
+            region = completed[-1]['region']
+        session_rows = [row for row in completed if row['region'] == region][-sessions:]
+        # Общая таблица URL: id совпадают между сессиями и кодируются без перекодировки строк
+        url_table = ValueTable()
+        frames = [self.db.get_session_frame(row['id'], url_table) for row in session_rows]
+        tensor = encode_frames(frames, queries, top_n=top_n, key=key)
+        tensor.session_dates = [row['created_at'] for row in session_rows]
+        self.logger.info(f"Тензор выдачи {tensor.shape}, словарь: {len(tensor.vocabulary)}")
+        return tensor
+
+    def serp_updates(self, sessions: int = 90, metric: str = 'rbo', key: str = 'url',
+                     region: Optional[int] = None, **kwargs) -> List[Dict]:
+        """Апдейты выдачи по всем запросам региона с ID и датами сессий."""
+        tensor = self.load(sessions=sessions, key=key, region=region)
+        transitions = detect_serp_updates(consecutive_similarity(tensor.ids, metric), **kwargs)
+        for transition in transitions:
+            transition['session_id'] = tensor.session_ids[transition['index']]
+            transition['created_at'] = tensor.session_dates[transition['index']]
+        return transitions
@@ -0,0 +1,253 @@
+# src/analytics/visibility.py
+from typing import Dict, List, Optional
+import logging
+from src.storage.database import Database, normalize_domain
+
+# Примерная доля кликов (CTR) по позициям выдачи - вес позиции в доле видимости
+POSITION_WEIGHTS = {
+    1: 0.28, 2: 0.15, 3: 0.11, 4: 0.08, 5: 0.07,
+    6: 0.05, 7: 0.04, 8: 0.03, 9: 0.03, 10: 0.02,
+}
+
+# Строки domain_index сессии вместе с запросами, которые планировщик перепроверок
+# в ней пропустил: их позиции берутся из сессии-источника, как в HTML-отчете.
+# Параметры: (session_id, session_id)
+SESSION_INDEX_CTE = '''
+    session_index(domain, query, position, carried) AS (
+        SELECT domain, query, position, 0 FROM domain_index WHERE session_id = ?
+        UNION ALL
+        SELECT d.domain, d.query, d.position, 1
+        FROM skipped_queries k
+        JOIN domain_index d ON d.session_id = k.source_session_id AND d.query = k.query
+        WHERE k.session_id = ?
+    )
+'''
+
+# Завершенные сессии с данными в индексе (собранными или перенесенными).
+# Недособранная сессия дала бы покрытие по части запросов.
+# Параметры: (region, region) - None означает любой регион
+COMPLETED_SESSIONS_SQL = '''
+    SELECT id FROM sessions
+    WHERE completed_at IS NOT NULL
+      AND (? IS NULL OR region = ?)
+      AND id IN (SELECT session_id FROM domain_index
+                 UNION
+                 SELECT session_id FROM skipped_queries)
+'''
+
+class DomainVisibility:
+    """
+    Видимость доменов по всем ключевым словам на основе domain_index.
+
+    Все агрегаты считаются одним SQL-запросом по индексу сессии,
+    без загрузки результатов в Python. Непроверенные в сессии запросы
+    учитываются по последним известным позициям (SESSION_INDEX_CTE).
+    """
+
+    def __init__(self, settings, db: Optional[Database] = None):
+        self.settings = settings
+        self.db = db or Database(settings)
+        self.logger = logging.getLogger(__name__)
+
+    def tracked_domains(self) -> List[str]:
+        """Целевой домен и конкуренты из настроек (нормализованные)."""
+        domains = [self.settings.TARGET_DOMAIN] + list(self.settings.COMPETITOR_DOMAINS)
+        return list(dict.fromkeys(normalize_domain(d) for d in domains if d))
+
+    def _resolve_session(self, conn, session_id: Optional[int],
+                         region: Optional[int] = None) -> Optional[int]:
+        """Последняя завершенная сессия (региона, если он указан), если сессия не указана."""
+        if session_id is not None:
+            return session_id
+        row = conn.execute(f'SELECT MAX(id) FROM ({COMPLETED_SESSIONS_SQL})', (region, region)).fetchone()
+        return row[0]
+
+    def _previous_session(self, conn, session_id: int) -> Optional[int]:
+        """Предыдущая завершенная сессия того же региона (выдача регионов несравнима)."""
+        row = conn.execute('SELECT region FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        region = row[0]
+        row = conn.execute(
+            f'SELECT MAX(id) FROM ({COMPLETED_SESSIONS_SQL}) WHERE id < ?', (region, region, session_id)
+        ).fetchone()
+        return row[0]
+
+    def _weights_cte(self, top_n: int) -> str:
+        values = ', '.join(
+            f'({pos}, {weight})' for pos, weight in POSITION_WEIGHTS.items() if pos <= top_n
+        )
+        return f'weights(position, weight) AS (VALUES {values})'
+
+    def coverage(self, domains: Optional[List[str]] = None, session_id: Optional[int] = None,
+                 top_n: int = 10, region: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Покрытие ключевых слов доменами в одной сессии.
+
+        Args:
+            domains: список доменов (по умолчанию - целевой и конкуренты)
+            session_id: сессия (по умолчанию - последняя завершенная)
+            top_n: учитывать позиции не ниже top_n
+            region: регион сессии по умолчанию (по умолчанию - любой)
+
+        Returns:
+            {домен: {'keywords', 'coverage', 'avg_position', 'top3', 'share_of_voice'}}
+        """
+        domains = [normalize_domain(d) for d in (domains or self.tracked_domains())]
+        empty = {'keywords': 0, 'coverage': 0.0, 'avg_position': None, 'top3': 0, 'share_of_voice': 0.0}
+        report = {domain: dict(empty) for domain in domains}
+
+        with self.db.connect() as conn:
+            session_id = self._resolve_session(conn, session_id, region)
+            if session_id is None or not domains:
+                return report
+
+            total = conn.execute(
+                f'WITH {SESSION_INDEX_CTE} SELECT COUNT(DISTINCT query) FROM session_index',
+                (session_id, session_id)
+            ).fetchone()[0]
+
+            placeholders = ', '.join('?' * len(domains))
+            cursor = conn.execute(f'''
+                WITH {self._weights_cte(top_n)}, {SESSION_INDEX_CTE}
+                SELECT d.domain, COUNT(*), AVG(d.position),
+                       SUM(d.position <= 3), SUM(COALESCE(w.weight, 0))
+                FROM session_index d
+                LEFT JOIN weights w ON w.position = d.position
+                WHERE d.domain IN ({placeholders}) AND d.position <= ?
+                GROUP BY d.domain
+            ''', (session_id, session_id, *domains, top_n))
+
+            for domain, keywords, avg_position, top3, weight in cursor.fetchall():
+                report[domain] = {
+                    'keywords': keywords,
+                    'coverage': keywords / total if total else 0.0,
+                    'avg_position': round(avg_position, 2),
+                    'top3': top3,
+                    # Максимум доли - если домен на 1-м месте по всем запросам
+                    'share_of_voice': weight / (total * POSITION_WEIGHTS[1]) if total else 0.0,
+                }
+
+        return report
+
+    def share_of_voice(self, session_id: Optional[int] = None, top_n: int = 10,
+                       limit: int = 20, region: Optional[int] = None) -> List[Dict]:
+        """
+        Доля голоса всех доменов в сессии: сумма CTR-весов их позиций,
+        нормированная на сумму весов по всем доменам. Сессия по умолчанию -
+        последняя завершенная (в регионе region, если он указан).
+
+        Returns:
+            Список {'domain', 'share_of_voice', 'keywords', 'avg_position'} по убыванию доли
+        """
+        with self.db.connect() as conn:
+            session_id = self._resolve_session(conn, session_id, region)
+            if session_id is None:
+                return []
+
+            cursor = conn.execute(f'''
+                WITH {self._weights_cte(top_n)}, {SESSION_INDEX_CTE},
+                per_domain AS (
+                    SELECT d.domain, COUNT(*) AS keywords, AVG(d.position) AS avg_position,
+                           SUM(w.weight) AS weight
+                    FROM session_index d
+                    JOIN weights w ON w.position = d.position
+                    GROUP BY d.domain
+                )
+                SELECT domain, weight / (SELECT SUM(weight) FROM per_domain),
+                       keywords, avg_position
+                FROM per_domain
+                ORDER BY weight DESC
+                LIMIT ?
+            ''', (session_id, session_id, limit))
+
+            return [
+                {
+                    'domain': domain,
+                    'share_of_voice': round(share, 4),
+                    'keywords': keywords,
+                    'avg_position': round(avg_position, 2),
+                }
+                for domain, share, keywords, avg_position in cursor.fetchall()
+            ]
+
+    def domain_rankings(self, domain: str, session_id: Optional[int] = None,
+                        region: Optional[int] = None) -> List[Dict]:
+        """
+        Позиции домена по всем ключевым словам сессии
+        (по умолчанию - последней завершенной в регионе region или в любом).
+
+        Returns:
+            Список {'domain', 'session_id', 'query', 'position', 'carried'};
+            carried - позиция перенесена из прошлой проверки
+        """
+        domain = normalize_domain(domain)
+        with self.db.connect() as conn:
+            session_id = self._resolve_session(conn, session_id, region)
+            if session_id is None:
+                return []
+            cursor = conn.execute(f'''
+                WITH {SESSION_INDEX_CTE}
+                SELECT query, position, carried FROM session_index
+                WHERE domain = ?
+                ORDER BY position, query
+            ''', (session_id, session_id, domain))
+            return [
+                {'domain': domain, 'session_id': session_id, 'query': query,
+                 'position': position, 'carried': bool(carried)}
+                for query, position, carried in cursor.fetchall()
+            ]
+
+    def _positions(self, conn, domain: str, session_id: int) -> Dict[str, int]:
+        """{запрос: позиция домена} в сессии с учетом перенесенных запросов."""
+        cursor = conn.execute(f'''
+            WITH {SESSION_INDEX_CTE}
+            SELECT query, position FROM session_index WHERE domain = ?
+        ''', (session_id, session_id, domain))
+        return dict(cursor.fetchall())
+
+    def movers(self, domain: Optional[str] = None, session_id: Optional[int] = None,
+               previous_session_id: Optional[int] = None, region: Optional[int] = None) -> List[Dict]:
+        """
+        Изменения позиций домена между двумя сессиями.
+
+        Args:
+            domain: домен (по умолчанию - целевой)
+            session_id: текущая сессия (по умолчанию - последняя завершенная)
+            previous_session_id: с чем сравнивать (по умолчанию - предыдущая
+                завершенная сессия того же региона)
+            region: регион сессии по умолчанию (по умолчанию - любой)
+
+        Returns:
+            Список {'query', 'position', 'previous', 'change'} по убыванию |change|;
+            появившиеся и выпавшие запросы идут первыми (change = None)
+        """
+        domain = normalize_domain(domain or self.settings.TARGET_DOMAIN)
+
+        with self.db.connect() as conn:
+            session_id = self._resolve_session(conn, session_id, region)
+            if session_id is None:
+                return []
+            if previous_session_id is None:
+                previous_session_id = self._previous_session(conn, session_id)
+
+            positions: Dict[str, Dict] = {}
+            for key, sid in (('position', session_id), ('previous', previous_session_id)):
+                if sid is None:
+                    continue
+                for query, position in self._positions(conn, domain, sid).items():
+                    positions.setdefault(query, {'query': query, 'position': None, 'previous': None})[key] = position
+
+        movers = []
+        for row in positions.values():
+            if row['position'] is not None and row['previous'] is not None:
+                # Положительное значение - рост (позиция стала меньше)
+                row['change'] = row['previous'] - row['position']
+                if row['change'] == 0:
+                    continue
+            else:
+                row['change'] = None
+            movers.append(row)
+
+        movers.sort(key=lambda r: (r['change'] is not None, -abs(r['change'] or 0), r['query']))
+        return movers
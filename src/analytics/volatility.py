@@ -0,0 +1,102 @@
+# src/analytics/volatility.py
+"""
+Волатильность выдачи по запросам и адаптивный план перепроверок.
+
+Запрос, у которого топ-10 от проверки к проверке почти не меняется,
+можно проверять реже: интервал растет от 0 (каждый запуск) для
+волатильных запросов до RECHECK_MAX_STALENESS_DAYS для стабильных.
+Дольше этого срока запрос не пропускается никогда.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional
+import logging
+from src.storage.database import Database
+
+# Запас на дрейф времени запуска по расписанию (cron/демон стартуют не секунда в секунду)
+SCHEDULE_SLACK = timedelta(hours=2)
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Сходство двух наборов URL (1.0 - совпадают полностью)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def serp_volatility(checks: List[FrozenSet[str]]) -> float:
+    """
+    Средняя доля изменений топа между соседними проверками (0 - выдача стоит на месте).
+
+    Args:
+        checks: наборы URL топа по проверкам в хронологическом порядке
+    """
+    if len(checks) < 2:
+        return 1.0
+    changes = [1.0 - jaccard(prev, cur) for prev, cur in zip(checks, checks[1:])]
+    return sum(changes) / len(changes)
+
+class RecheckScheduler:
+    """Решает, какие запросы проверять в текущем запуске."""
+
+    def __init__(self, settings, db: Optional[Database] = None):
+        self.settings = settings
+        self.db = db or Database(settings)
+        self.logger = logging.getLogger(__name__)
+        self.max_staleness = timedelta(days=getattr(settings, 'RECHECK_MAX_STALENESS_DAYS', 7))
+        self.threshold = getattr(settings, 'RECHECK_VOLATILITY_THRESHOLD', 0.2)
+        self.window = getattr(settings, 'RECHECK_WINDOW', 5)
+        self.top_n = min(10, settings.MAX_RESULTS_PER_QUERY)
+
+    def recheck_interval(self, volatility: float) -> timedelta:
+        """Интервал между проверками: 0 при волатильности >= порога, макс. срок при 0."""
+        if self.threshold <= 0:
+            return timedelta(0)
+        return self.max_staleness * max(0.0, 1.0 - volatility / self.threshold)
+
+    def _history(self, since: datetime, region: int) -> Dict[str, List[tuple]]:
+        """{запрос: [(session_id, created_at, набор URL)] за последние window проверок региона}."""
+        history: Dict[str, List[tuple]] = {}
+        current = None
+        for query, session_id, created_at, url in self.db.get_recent_top_urls(since, region, self.top_n):
+            checks = history.setdefault(query, [])
+            if current != (query, session_id):
+                current = (query, session_id)
+                checks.append((session_id, created_at, set()))
+            checks[-1][2].add(url)
+        return {
+            query: [(sid, at, frozenset(urls)) for sid, at, urls in checks[-self.window:]]
+            for query, checks in history.items()
+        }
+
+    def plan(self, queries: List[str], region: int, now: Optional[datetime] = None) -> Dict:
+        """
+        План запуска для региона (выдача в разных регионах меняется независимо).
+
+        Returns:
+            {'due': запросы к проверке,
+             'skipped': {запрос: ID сессии с его последними результатами},
+             'volatility': {запрос: оценка волатильности}}
+        """
+        now = now or datetime.now()
+        # Истории за несколько максимальных интервалов хватает на окно проверок
+        history = self._history(now - self.max_staleness * (self.window + 1), region)
+
+        due, skipped, volatility = [], {}, {}
+        for query in queries:
+            checks = history.get(query, [])
+            if len(checks) < 2:
+                # Новый запрос или мало истории - проверяем
+                due.append(query)
+                continue
+
+            score = serp_volatility([urls for _, _, urls in checks])
+            volatility[query] = round(score, 3)
+
+            last_session_id, last_checked, _ = checks[-1]
+            age = now - datetime.fromisoformat(str(last_checked))
+            if age + SCHEDULE_SLACK >= self.recheck_interval(score):
+                due.append(query)
+            else:
+                skipped[query] = last_session_id
+
+        self.logger.info(f"План перепроверок: проверяем {len(due)}, пропускаем {len(skipped)} "
+                         f"из {len(queries)} запросов")
+        return {'due': due, 'skipped': skipped, 'volatility': volatility}
@@ -0,0 +1,332 @@
+# src/api/server.py
+"""
+Локальный HTTP API только для чтения поверх Database.
+
+    GET /api/sessions?limit=20
+    GET /api/sessions/<id>
+    GET /api/history?query=<запрос>&sessions=5
+    GET /api/movers?domain=<домен>&session=<id>&previous=<id>&region=<код>
+    GET /api/domains/<домен>?session=<id>&region=<код>
+    GET /api/share-of-voice?session=<id>&limit=20&region=<код>
+
+Без session берется последняя завершенная сессия (региона region, если он указан).
+
+Ответы кэшируются в LRU (с готовой gzip-версией и ETag) и сбрасываются,
+когда в базе появляется новая сессия или новые результаты.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+GZIP_MIN_SIZE = 512  # байт - меньшие ответы не сжимаем
+VERSION_CHECK_INTERVAL = 1.0  # секунд между проверками версии данных
+MAX_HEADER_LINES = 100
+KEEP_ALIVE_TIMEOUT = 15  # секунд
+
+STATUS_TEXT = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 500: 'Internal Server Error',
+}
+
+def _json_default(value):
+    """SerpResult и подобные - через to_dict(), даты и прочее - строкой."""
+    to_dict = getattr(value, 'to_dict', None)
+    return to_dict() if to_dict else str(value)
+
+class NotFound(Exception):
+    """Ресурс не найден (404)."""
+
+class BadRequest(Exception):
+    """Некорректные параметры запроса (400)."""
+
+class CachedResponse:
+    """Готовое тело ответа: исходное, сжатое и его ETag."""
+    __slots__ = ('status', 'body', 'gzipped', 'etag')
+
+    def __init__(self, status: int, payload):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, compresslevel=6) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+
+class ResponseCache:
+    """LRU кэш ответов, привязанный к версии данных в базе."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item
+
+    def put(self, key: str, item: CachedResponse):
+        self._items[key] = item
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def set_version(self, version) -> bool:
+        """Сбрасывает кэш, если версия данных изменилась. Возвращает True при сбросе."""
+        if version == self.version:
+            return False
+        self.version = version
+        self._items.clear()
+        return True
+
+    def __len__(self):
+        return len(self._items)
+
+class APIServer:
+    """asyncio HTTP сервер с маршрутами по данным SEO мониторинга."""
+
+    def __init__(self, settings, db=None):
+        from src.analytics.visibility import DomainVisibility
+        from src.storage.database import Database
+
+        self.settings = settings
+        self.db = db or Database(settings)
+        self.visibility = DomainVisibility(settings, self.db)
+        self.cache = ResponseCache(getattr(settings, 'API_CACHE_SIZE', 256))
+        self.logger = logging.getLogger(__name__)
+
+        self._version_checked_at = 0.0
+        self._version_lock = asyncio.Lock()
+        # Одинаковые запросы, пришедшие одновременно, считаются один раз
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.routes: Dict[str, Callable] = {
+            'sessions': self._sessions,
+            'history': self._history,
+            'movers': self._movers,
+            'domains': self._domains,
+            'share-of-voice': self._share_of_voice,
+        }
+
+    # --- Маршруты (выполняются в пуле потоков) ---------------------------
+
+    @staticmethod
+    def _int_param(params: Dict, name: str, default: Optional[int] = None) -> Optional[int]:
+        value = params.get(name, [None])[0]
+        if value is None or value == '':
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest(f"параметр {name} должен быть числом")
+
+    def _sessions(self, arg: Optional[str], params: Dict):
+        if arg is None:
+            return self.db.get_last_sessions(limit=self._int_param(params, 'limit', 20))
+        if not arg.isdigit():
+            raise BadRequest("ID сессии должен быть числом")
+        session = self.db.get_session(int(arg))
+        if not session:
+            raise NotFound(f"сессия {arg} не найдена")
+        session['results'] = self.db.get_session_results(session['id'])
+        return session
+
+    def _history(self, arg: Optional[str], params: Dict):
+        query = params.get('query', [''])[0]
+        if not query:
+            raise BadRequest("нужен параметр query")
+        return self.db.get_query_history(query, limit_sessions=self._int_param(params, 'sessions', 5))
+
+    def _movers(self, arg: Optional[str], params: Dict):
+        return self.visibility.movers(
+            domain=params.get('domain', [None])[0],
+            session_id=self._int_param(params, 'session'),
+            previous_session_id=self._int_param(params, 'previous'),
+            region=self._int_param(params, 'region'),
+        )
+
+    def _domains(self, arg: Optional[str], params: Dict):
+        session_id = self._int_param(params, 'session')
+        region = self._int_param(params, 'region')
+        if arg is None:
+            return self.visibility.coverage(session_id=session_id, region=region)
+        from src.storage.database import normalize_domain
+
+        # coverage() возвращает словарь по нормализованному домену (без www., в нижнем регистре)
+        domain = normalize_domain(arg)
+        return {
+            'domain': domain,
+            'coverage': self.visibility.coverage([domain], session_id=session_id, region=region)[domain],
+            'rankings': self.visibility.domain_rankings(domain, session_id=session_id, region=region),
+        }
+
+    def _share_of_voice(self, arg: Optional[str], params: Dict):
+        return self.visibility.share_of_voice(
+            session_id=self._int_param(params, 'session'),
+            limit=self._int_param(params, 'limit', 20),
+            region=self._int_param(params, 'region'),
+        )
+
+    def _dispatch(self, path: str, params: Dict) -> Tuple[int, object]:
+        """Синхронная обработка маршрута: (статус, данные)."""
+        parts = [unquote(p) for p in path.strip('/').split('/') if p]
+        if len(parts) < 2 or parts[0] != 'api' or parts[1] not in self.routes or len(parts) > 3:
+            return 404, {'error': 'маршрут не найден', 'routes': sorted(self.routes)}
+        try:
+            return 200, self.routes[parts[1]](parts[2] if len(parts) == 3 else None, params)
+        except NotFound as e:
+            return 404, {'error': str(e)}
+        except BadRequest as e:
+            return 400, {'error': str(e)}
+
+    def _build_response(self, path: str, params: Dict) -> CachedResponse:
+        """Маршрут и сериализация (json + gzip) - в пуле потоков, не в цикле событий."""
+        return CachedResponse(*self._dispatch(path, params))
+
+    # --- Кэш и HTTP -----------------------------------------------------
+
+    async def _refresh_version(self):
+        """Не чаще раза в секунду сверяет версию данных и сбрасывает кэш."""
+        if time.monotonic() - self._version_checked_at < VERSION_CHECK_INTERVAL:
+            return
+        async with self._version_lock:
+            if time.monotonic() - self._version_checked_at < VERSION_CHECK_INTERVAL:
+                return
+            version = await asyncio.get_running_loop().run_in_executor(None, self.db.get_data_version)
+            self._version_checked_at = time.monotonic()
+            if self.cache.set_version(version):
+                self.logger.info(f"Данные обновились ({version}), кэш API сброшен")
+
+    async def get_response(self, target: str) -> CachedResponse:
+        """Ответ на GET target - из кэша или вычисленный (с объединением дублей)."""
+        await self._refresh_version()
+
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        key = url.path + '?' + urlencode(sorted(params.items()), doseq=True)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        # Если кэш сбросят, пока ответ считается, ответ мог собраться из старых данных
+        version = self.cache.version
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(
+                None, self._build_response, url.path, params
+            )
+            if response.status == 200 and self.cache.version == version:
+                self.cache.put(key, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим; помечаем как полученное
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 с keep-alive: читаем запросы, пока клиент не закроет соединение."""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = await self._respond(writer, request_line, headers)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, request_line: bytes, headers: Dict) -> bool:
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            self._write(writer, 400, {}, b'', keep_alive=False)
+            return False
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if method not in ('GET', 'HEAD'):
+            self._write(writer, 405, {'Allow': 'GET, HEAD'}, b'', keep_alive)
+            return keep_alive
+
+        try:
+            response = await self.get_response(target)
+        except Exception as e:
+            self.logger.error(f"Ошибка API для {target}: {e}", exc_info=True)
+            response = CachedResponse(500, {'error': str(e)})
+
+        extra = {'ETag': response.etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if response.status == 200 and headers.get('if-none-match') == response.etag:
+            self._write(writer, 304, extra, b'', keep_alive)
+            return keep_alive
+
+        body = response.body
+        if response.gzipped is not None and 'gzip' in headers.get('accept-encoding', ''):
+            body = response.gzipped
+            extra['Content-Encoding'] = 'gzip'
+        extra['Content-Type'] = 'application/json; charset=utf-8'
+        self._write(writer, response.status, extra, b'' if method == 'HEAD' else body,
+                    keep_alive, content_length=len(body))
+        return keep_alive
+
+    @staticmethod
+    def _write(writer, status: int, headers: Dict, body: bytes, keep_alive: bool,
+               content_length: Optional[int] = None):
+        lines = [f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}']
+        headers = dict(headers)
+        headers['Content-Length'] = str(len(body) if content_length is None else content_length)
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None) -> asyncio.AbstractServer:
+        """Запускает сервер (port=0 - любой свободный порт)."""
+        host = host or self.settings.API_HOST
+        port = self.settings.API_PORT if port is None else port
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.logger.info(f"API запущен: http://{host}:{server.sockets[0].getsockname()[1]}/api/sessions")
+        return server
+
+def serve(settings, host: Optional[str] = None, port: Optional[int] = None):
+    """Блокирующий запуск API до Ctrl+C."""
+    async def main():
+        server = await APIServer(settings).start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
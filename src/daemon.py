@@ -0,0 +1,281 @@
+# src/daemon.py
+"""
+Долгоживущий режим: сбор и отчеты по расписанию в одном процессе.
+
+Демон держит "теплыми" HTTP-сессию парсера, соединение с SQLite и
+кэш конфигурации, запускает задачи строго по одной и принимает команды
+через локальный Unix-сокет (см. send_command).
+"""
+import json
+import logging
+import queue
+import signal
+import socket
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+JOBS = ('fetch', 'report')
+
+def parse_schedule(schedule: str) -> List[tuple]:
+    """'09:00, 18:30' -> [(9, 0), (18, 30)]"""
+    times = []
+    for item in schedule.split(','):
+        item = item.strip()
+        if item:
+            hour, minute = item.split(':')
+            times.append((int(hour), int(minute)))
+    return sorted(times)
+
+def next_run_time(times: List[tuple], now: datetime) -> Optional[datetime]:
+    """Ближайший момент по расписанию строго после now."""
+    if not times:
+        return None
+    candidates = []
+    for day in (0, 1):
+        base = now + timedelta(days=day)
+        for hour, minute in times:
+            candidate = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if candidate > now:
+                candidates.append(candidate)
+    return min(candidates)
+
+class DaemonAlreadyRunningError(RuntimeError):
+    """На управляющем сокете уже отвечает другой процесс демона."""
+
+def _socket_alive(socket_path: Path, timeout: float = 1.0) -> bool:
+    """Принимает ли кто-то соединения на unix-сокете (файл может остаться от упавшего процесса)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        try:
+            client.connect(str(socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """Одна команда JSON-строкой на соединение, ответ - JSON-строка."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8') or '{}')
+            response = self.server.daemon.handle_command(request.get('command', ''))
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+        self.wfile.write((json.dumps(response, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+
+class _ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class SEODaemon:
+    """Планировщик задач сбора и отчетов с теплыми соединениями."""
+
+    def __init__(self, settings):
+        from src.parser.yandex_parser import YandexParser
+        from src.storage.database import Database
+
+        self.settings = settings
+        self.logger = logging.getLogger(__name__)
+
+        # Теплые ресурсы на всё время жизни процесса
+        self.parser = YandexParser(settings)
+        self.db = Database(settings, persistent=True)
+
+        self.schedule = parse_schedule(settings.DAEMON_SCHEDULE)
+        self.next_run = next_run_time(self.schedule, datetime.now())
+
+        self._jobs: queue.Queue = queue.Queue()
+        self._state_lock = threading.Lock()
+        self._pending = set()
+        self._current: Optional[str] = None
+        self._history: Dict[str, Dict] = {}
+        # Время последнего сбора (в т.ч. из cron до запуска демона)
+        last = self.db.get_last_sessions(limit=1)
+        self._last_fetch_at = datetime.fromisoformat(str(last[0]['created_at'])) if last else None
+        self._stop = threading.Event()
+        self._server: Optional[_ControlServer] = None
+
+        # Кэш конфигурации: перечитываем файл только при изменении
+        self._config_cache: Dict[str, tuple] = {}
+
+    # --- Задачи ---------------------------------------------------------
+
+    def trigger(self, job: str, scheduled: bool = False) -> bool:
+        """
+        Ставит задачу в очередь.
+        
+        Args:
+            job: 'fetch' или 'report'
+            scheduled: запуск по расписанию (сбор пропускается, если
+                последний был меньше DAEMON_MIN_FETCH_INTERVAL назад)
+
+        Returns:
+            False, если такая задача уже ждет или выполняется
+        """
+        if job not in JOBS:
+            raise ValueError(f"Неизвестная задача: {job}")
+        with self._state_lock:
+            if job in self._pending or job == self._current:
+                return False
+            self._pending.add(job)
+        self._jobs.put((job, scheduled))
+        return True
+
+    def _load_config(self, name: str, loader):
+        """Результат loader() для config/<name>, кэшированный по mtime файла."""
+        from src.jobs import CONFIG_DIR
+
+        path = CONFIG_DIR / name
+        mtime = path.stat().st_mtime
+        cached = self._config_cache.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        value = loader(path)
+        self._config_cache[name] = (mtime, value)
+        return value
+
+    def _run_fetch(self, scheduled: bool) -> Dict:
+        from src.jobs import load_queries, load_region, run_fetch
+
+        # Защита от двойного сбора: пропускаем, если недавно уже собирали
+        if scheduled and self._last_fetch_at:
+            elapsed = (datetime.now() - self._last_fetch_at).total_seconds()
+            if elapsed < self.settings.DAEMON_MIN_FETCH_INTERVAL:
+                return {'skipped': f"последний сбор {int(elapsed)} с назад"}
+
+        queries = self._load_config('queries.txt', load_queries)
+        region = self._load_config('region.txt', load_region)
+        session_id, results = run_fetch(
+            self.settings, queries, region, parser=self.parser, db=self.db
+        )
+        self._last_fetch_at = datetime.now()
+        return {'session_id': session_id, 'queries': len(results)}
+
+    def _run_report(self) -> Dict:
+        from src.jobs import run_report
+
+        return {'report': run_report(self.settings, days_back=self.settings.DAEMON_REPORT_DAYS, db=self.db)}
+
+    def _worker(self):
+        """Выполняет задачи из очереди строго по одной."""
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            job, scheduled = item
+
+            with self._state_lock:
+                self._pending.discard(job)
+                self._current = job
+
+            started = datetime.now()
+            record = {'started_at': started, 'ok': False}
+            try:
+                self.logger.info(f"Демон: запуск задачи '{job}'")
+                record.update(self._run_fetch(scheduled) if job == 'fetch' else self._run_report())
+                record['ok'] = True
+            except Exception as e:
+                self.logger.error(f"Демон: задача '{job}' завершилась ошибкой: {e}", exc_info=True)
+                record['error'] = str(e)
+            finally:
+                record['finished_at'] = datetime.now()
+                record['duration'] = round((record['finished_at'] - started).total_seconds(), 2)
+                with self._state_lock:
+                    self._history[job] = record
+                    self._current = None
+
+            # После успешного сбора сразу обновляем отчет
+            if job == 'fetch' and record['ok'] and 'session_id' in record:
+                self.trigger('report')
+
+    # --- Управление -----------------------------------------------------
+
+    def status(self) -> Dict:
+        with self._state_lock:
+            return {
+                'current': self._current,
+                'pending': sorted(self._pending),
+                'next_run': self.next_run,
+                'last': dict(self._history),
+                'parser': self.parser.get_stats(),
+            }
+
+    def handle_command(self, command: str) -> Dict:
+        """Обработка команды с управляющего сокета."""
+        if command == 'status':
+            return {'ok': True, 'status': self.status()}
+        if command in JOBS:
+            queued = self.trigger(command)
+            return {'ok': queued, 'message': 'поставлено в очередь' if queued else 'уже выполняется'}
+        if command == 'stop':
+            self.stop()
+            return {'ok': True, 'message': 'остановка'}
+        return {'ok': False, 'error': f"неизвестная команда: {command}"}
+
+    def _start_control_server(self):
+        socket_path = Path(self.settings.DAEMON_SOCKET)
+        socket_path.parent.mkdir(exist_ok=True)
+        if socket_path.exists():
+            # Второй демон не должен перехватывать сокет работающего
+            if _socket_alive(socket_path):
+                raise DaemonAlreadyRunningError(f"Демон уже запущен (сокет {socket_path})")
+            socket_path.unlink()
+
+        self._server = _ControlServer(str(socket_path), _ControlHandler)
+        self._server.daemon = self
+        threading.Thread(target=self._server.serve_forever, name='control', daemon=True).start()
+        self.logger.info(f"Управляющий сокет: {socket_path}")
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Главный цикл: расписание + управляющий сокет до сигнала остановки."""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop())
+
+        try:
+            self._start_control_server()
+        except DaemonAlreadyRunningError:
+            self.db.close()
+            raise
+        worker = threading.Thread(target=self._worker, name='jobs')
+        worker.start()
+        self.logger.info(f"Демон запущен, следующий сбор: {self.next_run}")
+
+        try:
+            while not self._stop.is_set():
+                now = datetime.now()
+                if self.next_run and now >= self.next_run:
+                    self.trigger('fetch', scheduled=True)
+                    self.next_run = next_run_time(self.schedule, now)
+                    self.logger.info(f"Следующий сбор: {self.next_run}")
+
+                wait = (self.next_run - now).total_seconds() if self.next_run else 60
+                self._stop.wait(timeout=max(1, min(wait, 60)))
+        finally:
+            # Дожидаемся текущей задачи и закрываем ресурсы
+            self._jobs.put(None)
+            worker.join()
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+                Path(self.settings.DAEMON_SOCKET).unlink(missing_ok=True)
+            self.db.close()
+            self.logger.info("Демон остановлен")
+
+def send_command(settings, command: str, timeout: float = 5.0) -> Dict:
+    """Отправляет команду запущенному демону и возвращает ответ."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(settings.DAEMON_SOCKET))
+        client.sendall((json.dumps({'command': command}) + '\n').encode('utf-8'))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data.decode('utf-8'))
@@ -0,0 +1,151 @@
+# src/jobs.py
+"""
+Задачи пайплайна: сбор позиций и генерация отчета.
+
+Тяжелые модули (requests, парсер, отчеты) импортируются внутри функций,
+чтобы импорт этого модуля ничего не стоил быстрым командам CLI.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+CONFIG_DIR = Path(__file__).parent.parent / 'config'
+
+logger = logging.getLogger(__name__)
+
+def load_queries(queries_file: Optional[Path] = None) -> List[str]:
+    """
+    Загружает запросы из файла (по умолчанию config/queries.txt).
+
+    Варианты написания одного запроса (регистр, ё/е, пробелы) схлопываются
+    в первое встреченное написание.
+    """
+    from src.parser.queries import dedupe_queries
+
+    queries_file = queries_file or CONFIG_DIR / 'queries.txt'
+    with open(queries_file, 'r', encoding='utf-8') as f:
+        raw = [line.strip() for line in f if line.strip()]
+
+    queries, _ = dedupe_queries(raw)
+    if len(queries) < len(raw):
+        logger.info(f"Дубликатов запросов в {Path(queries_file).name}: {len(raw) - len(queries)}")
+    return queries
+
+def load_region(region_file: Optional[Path] = None) -> int:
+    """Читает регион из файла (по умолчанию config/region.txt)."""
+    region_file = region_file or CONFIG_DIR / 'region.txt'
+    with open(region_file, 'r', encoding='utf-8') as f:
+        return int(f.read().strip())
+
+class FetchInProgressError(RuntimeError):
+    """Сбор уже идет в другом процессе (cron или демон)."""
+
+@contextmanager
+def fetch_lock(settings):
+    """
+    Межпроцессная блокировка сбора: не дает cron-запуску и демону
+    парсить одновременно. Блокировка снимается ОС при падении процесса.
+    """
+    import fcntl
+
+    settings.ensure_dirs()
+    lock_path = Path(settings.DATABASE_URL.replace('sqlite:///', '')).parent / 'fetch.lock'
+    with open(lock_path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise FetchInProgressError(f"Сбор уже выполняется (блокировка {lock_path})")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def run_fetch(settings, queries: List[str], region: int, parser=None, db=None,
+              session_id: Optional[int] = None,
+              adaptive: Optional[bool] = None) -> Tuple[int, List[Dict]]:
+    """
+    Парсит запросы и сохраняет результаты в сессию по мере получения.
+
+    Args:
+        settings: настройки проекта
+        queries: список запросов
+        region: код региона Яндекса
+        parser: готовый YandexParser (по умолчанию создается новый)
+        db: готовый Database (по умолчанию создается новый)
+        session_id: продолжить существующую сессию - будут обработаны
+            только запросы, которых в ней еще нет
+        adaptive: проверять только запросы, которым пора по волатильности
+            (по умолчанию settings.ADAPTIVE_RECHECK); остальные отмечаются
+            в сессии как пропущенные
+
+    Returns:
+        (ID сессии, список результатов по запросам)
+    """
+    from src.parser.yandex_parser import YandexParser
+    from src.storage.database import Database
+
+    parser = parser or YandexParser(settings)
+    db = db or Database(settings)
+
+    if adaptive is None:
+        adaptive = getattr(settings, 'ADAPTIVE_RECHECK', False)
+
+    with fetch_lock(settings):
+        return _fetch_into_session(settings, queries, region, parser, db, session_id, adaptive)
+
+def _fetch_into_session(settings, queries, region, parser, db, session_id, adaptive=False):
+    """Тело run_fetch, выполняется под блокировкой сбора."""
+    if session_id is None:
+        skipped = {}
+        if adaptive:
+            from src.analytics.volatility import RecheckScheduler
+
+            plan = RecheckScheduler(settings, db).plan(queries, region)
+            queries, skipped = plan['due'], plan['skipped']
+
+        session_id = db.create_session(region=region, search_engine='yandex')
+        db.save_skipped_queries(session_id, skipped)
+    else:
+        from src.parser.queries import normalize_query
+
+        # Пропущенные планировщиком запросы тоже считаются обработанными
+        done = set(db.get_session_queries(session_id)) | set(db.get_skipped_queries(session_id))
+        done = {normalize_query(q) for q in done}
+        queries = [q for q in queries if normalize_query(q) not in done]
+        logger.info(f"Продолжаем сессию #{session_id}: осталось {len(queries)} запросов")
+
+    from src.storage.writer import WriteBehindWriter
+
+    # Результаты пишет один поток пачками; при выходе из with очередь дописывается
+    with WriteBehindWriter(settings) as writer:
+        def save(query_result: Dict):
+            writer.put(session_id, query_result['query'], query_result['results'])
+
+        results = parser.parse_queries(
+            queries,
+            region=region,
+            max_results=settings.MAX_RESULTS_PER_QUERY,
+            on_result=save
+        )
+    db.complete_session(session_id)
+
+    if getattr(settings, 'PARQUET_EXPORT', False):
+        export_session(settings, session_id, db=db)
+
+    return session_id, results
+
+def export_session(settings, session_id: int, db=None):
+    """Выгрузка сессии в Parquet; ошибка выгрузки не ломает сбор."""
+    try:
+        from src.storage.parquet_export import ParquetStore
+
+        ParquetStore(settings, db=db).export_session(session_id)
+    except Exception as e:
+        logger.error(f"Не удалось выгрузить сессию #{session_id} в Parquet: {e}", exc_info=True)
+
+def run_report(settings, days_back: int = 2, db=None) -> Optional[str]:
+    """Генерирует HTML отчет за последние N дней и возвращает путь к нему."""
+    from src.reporting.html_builder import HTMLBuilder
+
+    return HTMLBuilder(settings, db=db).generate_report(days_back=days_back)
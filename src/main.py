@@ -1,11 +1,30 @@
-# src/main.py - обновленная версия
+# src/main.py - единая точка входа (CLI)
+"""
+SEO-агент: команды командной строки.
+
+    python -m src.main fetch            # собрать позиции по config/queries.txt
+    python -m src.main resume           # дособрать прерванную сессию
+    python -m src.main report --days 2  # HTML отчет
+    python -m src.main analyze          # видимость целевого домена и конкурентов
+    python -m src.main status           # последние сессии
+    python -m src.main compact          # ротация и компактизация базы
+    python -m src.main daemon           # сбор и отчеты по расписанию
+    python -m src.main ctl status       # команда запущенному демону
+    python -m src.main serve            # локальный HTTP API для просмотра данных
+    python -m src.main export           # выгрузка сессий в Parquet
+
+Модули команд (парсер, requests, отчеты) импортируются только внутри
+обработчика нужной команды, поэтому --help и status стартуют мгновенно.
+"""
+import argparse
 import logging
-from config.settings import settings
+import sys
 
-def setup_logging():
-    """Настройка логирования для отладки парсера."""
+def setup_logging(settings, verbose: bool = False):
+    """Настройка логирования (DEBUG с -v)."""
+    settings.ensure_dirs()
     logging.basicConfig(
-        level=logging.DEBUG,  # DEBUG для подробных логов
+        level=logging.DEBUG if verbose else logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler(settings.LOGS_DIR / 'seo_parser.log'),
@@ -13,100 +32,287 @@ def setup_logging():
         ]
     )
 
-def main():
-    """Тестируем только парсер."""
-    setup_logging()
-    logger = logging.getLogger(__name__)
-    
-    print("🔍 Тестирование XMLStock парсера")
-    print("=" * 50)
-    
-    # Импортируем парсер
+def cmd_fetch(settings, args) -> int:
+    """Собирает позиции по всем запросам в новую сессию."""
+    from src.jobs import load_queries, load_region, run_fetch
     from src.parser.yandex_parser import YandexParser
-    
-    # Создаем экземпляр
+    from src.storage.database import Database
+
+    print("🔍 Сбор позиций через XMLStock")
+    print("=" * 50)
+
     parser = YandexParser(settings)
-    
-    # Тестируем подключение
-    print("\n1. Тестируем подключение к API...")
+
+    print("\n1. Проверяем подключение к API...")
     if not parser.test_connection():
         print("❌ Не удалось подключиться к XMLStock API")
         print("   Проверьте:")
         print("   1. API ключ в .env файле")
         print("   2. Баланс на XMLStock")
         print("   3. Интернет-соединение")
-        return
-    
+        return 1
     print("✅ Подключение успешно")
-    
-    def load_queries():
-        """Загружает запросы из файла."""
-        from pathlib import Path
-        queries_file = Path(__file__).parent.parent / 'config' / 'queries.txt'
-        with open(queries_file, 'r', encoding='utf-8') as f:
-            return [line.strip() for line in f if line.strip()]
-    
-    # Загружаем запросы
-    queries = load_queries()
-    
-    def load_region():
-        """Читает регион из файла."""
-        from pathlib import Path
-        region_file = Path(__file__).parent.parent / 'config' / 'region.txt'
-        with open(region_file, 'r', encoding='utf-8') as f:
-            return int(f.read().strip())
-    
-    print(f"\n2. Парсим {len(queries)} запросов...")
+
+    queries = load_queries(args.queries_file)
     region = load_region()
-    print(f"   (регион: {region}, результаты: топ-10)")
-    
+    print(f"\n2. Парсим {len(queries)} запросов...")
+    print(f"   (регион: {region}, результаты: топ-{settings.MAX_RESULTS_PER_QUERY})")
+
+    session_id, results = run_fetch(
+        settings, queries, region, parser=parser, adaptive=args.adaptive or None
+    )
+    print(f"💾 Данные сохранены в базу (сессия #{session_id})")
+    skipped = Database(settings).get_skipped_queries(session_id)
+    if skipped:
+        print(f"   Пропущено стабильных запросов: {len(skipped)} "
+              f"(в отчете - последние известные результаты)")
+    stats = parser.get_stats()
+    print(f"   Лимиты XMLStock: {stats['rate']} запр/с, параллельно {stats['concurrency']}, "
+          f"троттлинг: {stats['throttled']}, ошибок: {stats['errors']}")
+
+    _print_results(results)
+    _dump_debug(settings, results)
+
+    if args.report:
+        return cmd_report(settings, args)
+    return 0
+
+def cmd_resume(settings, args) -> int:
+    """Дособирает запросы прерванной (или указанной) сессии."""
+    from src.jobs import load_queries, run_fetch
+    from src.storage.database import Database
+
+    db = Database(settings)
+    session = db.get_session(args.session) if args.session else db.get_incomplete_session()
+    if not session:
+        print("✅ Незавершенных сессий нет")
+        return 0
+
+    queries = load_queries(args.queries_file)
+    print(f"🔁 Продолжаем сессию #{session['id']} от {session['created_at']}")
+
+    session_id, results = run_fetch(
+        settings, queries, session['region'], db=db, session_id=session['id']
+    )
+    print(f"💾 Дособрано запросов: {len(results)} (сессия #{session_id})")
+    return 0
+
+def cmd_report(settings, args) -> int:
+    """Генерирует HTML отчет."""
+    from src.jobs import run_report
+
+    report_path = run_report(settings, days_back=args.days)
+    if not report_path:
+        print("❌ Нет данных для отчета")
+        return 1
+
+    print(f"📄 HTML отчет создан: {report_path}")
+    return 0
+
+def cmd_analyze(settings, args) -> int:
+    """Видимость целевого домена и конкурентов по всем ключевым словам."""
+    from src.analytics.visibility import DomainVisibility
+
+    visibility = DomainVisibility(settings)
+
+    print("📈 Видимость доменов" + (f" (сессия #{args.session})" if args.session else ""))
+    print("=" * 50)
+    for domain, row in visibility.coverage(session_id=args.session).items():
+        avg = row['avg_position'] if row['avg_position'] is not None else '-'
+        print(f"   {domain:30s} запросов: {row['keywords']:4d} "
+              f"({row['coverage']:.0%}), ср. позиция: {avg}, SoV: {row['share_of_voice']:.1%}")
+
+    print(f"\n🏆 Топ-{args.top} доменов по доле голоса:")
+    for i, row in enumerate(visibility.share_of_voice(session_id=args.session, limit=args.top), 1):
+        print(f"   {i:2d}. {row['domain']:30s} {row['share_of_voice']:.1%} "
+              f"(запросов: {row['keywords']}, ср. позиция: {row['avg_position']})")
+
+    if args.updates:
+        _print_serp_updates(settings, args.updates)
+    return 0
+
+def _print_serp_updates(settings, sessions: int):
+    """Сходство выдачи с предыдущей проверкой (RBO) и найденные апдейты."""
+    from src.analytics.similarity import SerpSimilarity
+
+    print(f"\n🌊 Изменения выдачи по последним {sessions} сессиям (RBO с предыдущей):")
+    for row in SerpSimilarity(settings).serp_updates(sessions=sessions):
+        if row['mean_similarity'] is None:
+            continue
+        mark = '⚡ апдейт' if row['update'] else ''
+        print(f"   #{row['session_id']:<5} {str(row['created_at'])[:16]}  "
+              f"{row['mean_similarity']:.3f} {mark}")
+
+def cmd_status(settings, args) -> int:
+    """Последние сессии и размер базы."""
+    from src.storage.database import Database
+
+    db = Database(settings)
+    print(f"🗄  База: {db.db_path} ({db.db_path.stat().st_size} байт)")
+    for session in db.get_last_sessions(limit=args.limit):
+        state = '✅' if session.get('completed_at') else '⏳'
+        archive = f" [архив {session['archive']}]" if session.get('archive') else ''
+        print(f"   {state} #{session['id']} {session['created_at']} регион {session['region']}{archive}")
+    return 0
+
+def cmd_compact(settings, args) -> int:
+    """Архивирует старые сессии и компактизирует базу."""
+    from src.storage.retention import RetentionManager
+
+    manager = RetentionManager(settings)
+    stats = manager.archive_old_sessions(args.older_than)
+    print(f"✅ Архивировано сессий: {stats['sessions']} (строк: {stats['rows']})")
+    sizes = manager.compact()
+    print(f"✅ Размер базы: {sizes['size_before']} -> {sizes['size_after']} байт")
+    return 0
+
+def cmd_daemon(settings, args) -> int:
+    """Запускает долгоживущий режим с расписанием DAEMON_SCHEDULE."""
+    from src.daemon import DaemonAlreadyRunningError, SEODaemon
+
+    daemon = SEODaemon(settings)
+    print(f"🤖 Демон запущен (расписание: {settings.DAEMON_SCHEDULE}, сокет: {settings.DAEMON_SOCKET})")
+    try:
+        daemon.run()
+    except DaemonAlreadyRunningError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+def cmd_ctl(settings, args) -> int:
+    """Отправляет команду запущенному демону."""
+    import json
+    from src.daemon import send_command
+
+    try:
+        response = send_command(settings, args.action)
+    except OSError as e:
+        print(f"❌ Демон не отвечает ({settings.DAEMON_SOCKET}): {e}")
+        return 1
+
+    print(json.dumps(response, ensure_ascii=False, indent=2, default=str))
+    return 0 if response.get('ok') else 1
+
+def cmd_serve(settings, args) -> int:
+    """Запускает локальный HTTP API (только чтение)."""
+    from src.api.server import serve
+
+    port = args.port or settings.API_PORT
+    print(f"🌐 API: http://{settings.API_HOST}:{port}/api/sessions (Ctrl+C - остановка)")
+    serve(settings, port=port)
+    return 0
+
+def cmd_export(settings, args) -> int:
+    """Выгружает в Parquet завершенные сессии, которых еще нет в датасете."""
+    from src.storage.parquet_export import ParquetStore
+
+    store = ParquetStore(settings)
+    if args.session:
+        path = store.export_session(args.session)
+        print(f"📦 {path}" if path else f"❌ Сессия #{args.session} пуста или не найдена")
+        return 0 if path else 1
+
+    exported = store.export_pending()
+    print(f"📦 Выгружено сессий: {len(exported)} -> {store.root}")
+    return 0
+
+def _print_results(results):
+    """Краткий вывод топ-5 по каждому запросу."""
+    print("\n3. Результаты парсинга:")
+    print("=" * 50)
+
+    for query_result in results:
+        print(f"\n📋 Запрос: '{query_result['query']}'")
+        print(f"   Время: {query_result['parsed_at']}")
+        print(f"   Найдено результатов: {query_result['results_count']}")
+
+        if query_result['results']:
+            print("\n   Топ-5 результатов:")
+            for result in query_result['results'][:5]:
+                print(f"   {result['position']:2d}. {result.get('title', 'Без заголовка')[:60]}...")
+                print(f"      URL: {result['url']}")
+                print(f"      Домен: {result.get('domain', 'N/A')}")
+
+        print("-" * 50)
+
+def _dump_debug(settings, results):
+    """Сохраняет сырые данные для отладки."""
+    import json
+
+    debug_file = settings.LOGS_DIR / 'parser_debug.json'
+    with open(debug_file, 'w', encoding='utf-8') as f:
+        # SerpResult -> словарь
+        json.dump(results, f, ensure_ascii=False, indent=2, default=lambda o: o.to_dict())
+    print(f"\n💾 Сырые данные сохранены в: {debug_file}")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Описание команд CLI."""
+    parser = argparse.ArgumentParser(prog='seo-agent', description='SEO мониторинг позиций в Яндексе')
+    parser.add_argument('-v', '--verbose', action='store_true', help='подробные логи (DEBUG)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', help='собрать позиции по всем запросам')
+    fetch.add_argument('--queries-file', help='файл с запросами (по умолчанию config/queries.txt)')
+    fetch.add_argument('--report', action='store_true', help='сразу сгенерировать отчет')
+    fetch.add_argument('--days', type=int, default=2, help='период отчета в днях')
+    fetch.add_argument('--adaptive', action='store_true',
+                       help='проверять только запросы, которым пора по волатильности выдачи')
+    fetch.set_defaults(handler=cmd_fetch)
+
+    resume = commands.add_parser('resume', help='дособрать прерванную сессию')
+    resume.add_argument('--session', type=int, help='ID сессии (по умолчанию - последняя незавершенная)')
+    resume.add_argument('--queries-file', help='файл с запросами (по умолчанию config/queries.txt)')
+    resume.set_defaults(handler=cmd_resume)
+
+    report = commands.add_parser('report', help='сгенерировать HTML отчет')
+    report.add_argument('--days', type=int, default=2, help='период в днях (0 - все сессии)')
+    report.set_defaults(handler=cmd_report)
+
+    analyze = commands.add_parser('analyze', help='видимость доменов и доля голоса')
+    analyze.add_argument('--session', type=int, help='ID сессии (по умолчанию - последняя)')
+    analyze.add_argument('--top', type=int, default=10, help='сколько доменов показать')
+    analyze.add_argument('--updates', type=int, nargs='?', const=90, metavar='SESSIONS',
+                         help='найти апдейты выдачи по последним SESSIONS сессиям (по умолчанию 90)')
+    analyze.set_defaults(handler=cmd_analyze)
+
+    status = commands.add_parser('status', help='последние сессии')
+    status.add_argument('--limit', type=int, default=5, help='сколько сессий показать')
+    status.set_defaults(handler=cmd_status)
+
+    compact = commands.add_parser('compact', help='архивировать старые сессии и сжать базу')
+    compact.add_argument('--older-than', type=int, help='порог в днях (по умолчанию RETENTION_DAYS)')
+    compact.set_defaults(handler=cmd_compact)
+
+    daemon = commands.add_parser('daemon', help='сбор и отчеты по расписанию в одном процессе')
+    daemon.set_defaults(handler=cmd_daemon)
+
+    ctl = commands.add_parser('ctl', help='управление запущенным демоном')
+    ctl.add_argument('action', choices=['status', 'fetch', 'report', 'stop'])
+    ctl.set_defaults(handler=cmd_ctl)
+
+    serve = commands.add_parser('serve', help='локальный HTTP API по отчетам и истории')
+    serve.add_argument('--port', type=int, help='порт (по умолчанию API_PORT)')
+    serve.set_defaults(handler=cmd_serve)
+
+    export = commands.add_parser('export', help='выгрузить сессии в Parquet (data/parquet)')
+    export.add_argument('--session', type=int, help='выгрузить (перезаписать) одну сессию')
+    export.set_defaults(handler=cmd_export)
+
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    from config.settings import settings
+    setup_logging(settings, args.verbose)
+
     try:
-        results = parser.parse_queries(queries, region=region, max_results=10)
-        
-        # Сохраняем в базу данных
-        from src.storage.database import Database
-        db = Database(settings)
-        session_id = db.create_session(region=region, search_engine='yandex')
-        
-        for query_result in results:
-            db.save_results(session_id, query_result['query'], query_result['results'])
-        
-        print(f"💾 Данные сохранены в базу (сессия #{session_id})")
-        
-        print(f"\n3. Результаты парсинга:")
-        print("=" * 50)
-        
-        for query_result in results:
-            print(f"\n📋 Запрос: '{query_result['query']}'")
-            print(f"   Время: {query_result['parsed_at']}")
-            print(f"   Найдено результатов: {query_result['results_count']}")
-            
-            if query_result['results']:
-                print("\n   Топ-5 результатов:")
-                for i, result in enumerate(query_result['results'][:5], 1):
-                    print(f"   {result['position']:2d}. {result.get('title', 'Без заголовка')[:60]}...")
-                    print(f"      URL: {result['url']}")
-                    print(f"      Домен: {result.get('domain', 'N/A')}")
-                    
-            print("-" * 50)
-        
-        # Сохраняем сырые данные для отладки
-        import json
-        debug_file = settings.LOGS_DIR / 'parser_debug.json'
-        with open(debug_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n💾 Сырые данные сохранены в: {debug_file}")
-        
+        return args.handler(settings, args)
     except Exception as e:
-        logger.error(f"Критическая ошибка при парсинге: {e}", exc_info=True)
+        logging.getLogger(__name__).error(f"Критическая ошибка: {e}", exc_info=True)
         print(f"\n❌ Ошибка: {e}")
-        print("\nПроверьте логи в: seo_parser.log")
+        print(f"\nПроверьте логи в: {settings.LOGS_DIR / 'seo_parser.log'}")
+        return 1
 
 if __name__ == "__main__":
-    main()
-    
-from src.reporting.html_builder import HTMLBuilder
-reporter = HTMLBuilder(settings)
-report_path = reporter.generate_report(days_back=2)
-print(f"📄 HTML отчет создан: {report_path}")
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# src/parser/queries.py
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_query(query: str) -> str:
+    """
+    Каноническая форма запроса для Яндекса: регистр, "ё"/"е" и пробелы
+    на выдачу не влияют, поэтому такие варианты считаются одним запросом.
+
+    '  Водомат  Питьевой ВОДЫ ' -> 'водомат питьевой воды'
+    'Ёмкость для воды'         -> 'емкость для воды'
+    """
+    query = unicodedata.normalize('NFKC', query or '')
+    query = query.lower().replace('ё', 'е')
+    return _WHITESPACE.sub(' ', query).strip()
+
+def dedupe_queries(queries: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Убирает варианты написания одного и того же запроса.
+
+    Returns:
+        (уникальные запросы в первом встреченном написании,
+         {нормализованный запрос: все исходные написания})
+    """
+    unique = []
+    variants: Dict[str, List[str]] = {}
+    for query in queries:
+        key = normalize_query(query)
+        if not key:
+            continue
+        if key not in variants:
+            variants[key] = []
+            unique.append(query.strip())
+        variants[key].append(query)
+    return unique, variants
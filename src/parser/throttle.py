@@ -0,0 +1,144 @@
+# src/parser/throttle.py
+import threading
+import time
+from typing import Dict, Optional
+
+# Коды ошибок Яндекс.XML / XMLStock в теле ответа
+XML_ERROR_NO_RESULTS = 15       # "Искомая комбинация слов нигде не встречается" - не ошибка нагрузки
+XML_THROTTLE_CODES = {32, 55}   # исчерпан лимит / превышена частота запросов
+
+# HTTP статусы, означающие перегрузку провайдера
+HTTP_THROTTLE_STATUSES = {429, 503}
+
+class AIMDController:
+    """
+    Адаптивный ограничитель нагрузки на XMLStock (AIMD, как в TCP).
+
+    Успешный быстрый ответ аддитивно увеличивает допустимые параллельность
+    и частоту запросов (примерно на шаг за "окно" из текущего числа запросов),
+    троттлинг или ошибка - мультипликативно уменьшают их. Уменьшение
+    срабатывает не чаще раза за cooldown, чтобы пачка ошибок из одного окна
+    не обрушила лимиты до минимума.
+    """
+
+    def __init__(self, initial_rate: float = 1.0, min_rate: float = 0.2, max_rate: float = 5.0,
+                 initial_concurrency: int = 1, max_concurrency: int = 4,
+                 rate_step: float = 0.25, decrease_factor: float = 0.5,
+                 target_latency: float = 5.0, cooldown: float = 5.0):
+        """
+        Args:
+            initial_rate: стартовая частота (запросов в секунду)
+            min_rate, max_rate: границы частоты
+            initial_concurrency, max_concurrency: границы параллельности
+            rate_step: аддитивный шаг частоты за окно успешных ответов
+            decrease_factor: множитель при троттлинге/ошибке
+            target_latency: ответы медленнее (сек) не повышают лимиты
+            cooldown: минимальный интервал между уменьшениями (сек)
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+
+        self._rate = min(max(initial_rate, min_rate), max_rate)
+        self._concurrency = float(min(max(1, initial_concurrency), self.max_concurrency))
+        self._in_flight = 0
+        self._next_start = 0.0
+        self._last_decrease = float('-inf')
+        self._latency_ewma: Optional[float] = None
+        self._counters = {'requests': 0, 'successes': 0, 'throttled': 0, 'errors': 0,
+                          'increases': 0, 'decreases': 0}
+        self._cond = threading.Condition()
+
+    @property
+    def concurrency_limit(self) -> int:
+        return max(1, int(self._concurrency))
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def acquire(self):
+        """Ждет свободный слот параллельности и свою очередь по частоте."""
+        with self._cond:
+            while self._in_flight >= self.concurrency_limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+            # Резервируем момент старта, чтобы соблюдать интервал 1/rate
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + 1.0 / self._rate
+
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self, latency: float, status_code: Optional[int] = 200,
+                xml_error: Optional[int] = None, error: bool = False):
+        """
+        Освобождает слот и подстраивает лимиты по результату запроса.
+
+        Троттлинг, сетевые ошибки и 5xx снижают лимиты. Прочие ошибки
+        (4xx, ошибка в XML, неразбираемый ответ) считаются ошибками,
+        но лимиты не меняют: нагрузка тут ни при чем, а успехом это не является.
+
+        Args:
+            latency: время ответа в секундах
+            status_code: HTTP статус (None - сетевая ошибка)
+            xml_error: код ошибки из XML ответа, если был
+            error: ответ получен, но обработать его не удалось
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._counters['requests'] += 1
+            self._latency_ewma = latency if self._latency_ewma is None else \
+                0.8 * self._latency_ewma + 0.2 * latency
+
+            throttled = status_code in HTTP_THROTTLE_STATUSES or xml_error in XML_THROTTLE_CODES
+            overloaded = status_code is None or (status_code >= 500 and not throttled)
+
+            if throttled or overloaded:
+                self._counters['throttled' if throttled else 'errors'] += 1
+                self._decrease()
+            elif error or not 200 <= status_code < 300 or \
+                    (xml_error is not None and xml_error != XML_ERROR_NO_RESULTS):
+                self._counters['errors'] += 1
+            else:
+                self._counters['successes'] += 1
+                if latency <= self.target_latency:
+                    self._increase()
+
+            self._cond.notify_all()
+
+    def _increase(self):
+        # +шаг примерно за окно из concurrency_limit успешных запросов
+        window = self.concurrency_limit
+        self._rate = min(self.max_rate, self._rate + self.rate_step / window)
+        self._concurrency = min(float(self.max_concurrency), self._concurrency + 1.0 / window)
+        self._counters['increases'] += 1
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+        self._concurrency = max(1.0, self._concurrency * self.decrease_factor)
+        # Пауза перед следующими стартами
+        self._next_start = max(self._next_start, now + 1.0 / self._rate)
+        self._counters['decreases'] += 1
+
+    def stats(self) -> Dict:
+        """Текущие лимиты и счетчики."""
+        with self._cond:
+            return {
+                'rate': round(self._rate, 3),
+                'concurrency': self.concurrency_limit,
+                'in_flight': self._in_flight,
+                'latency_avg': round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+                **self._counters,
+            }
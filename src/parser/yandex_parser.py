@@ -1,9 +1,19 @@
 # src/parser/yandex_parser.py
 import requests
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import threading
+from typing import List, Dict, Optional, Callable
 import time
 import logging
+from src.parser.queries import normalize_query
+from src.records import SerpResult
+from src.parser.throttle import (
+    AIMDController, HTTP_THROTTLE_STATUSES, XML_ERROR_NO_RESULTS, XML_THROTTLE_CODES
+)
+
+# Сколько раз повторять запрос, на который XMLStock ответил троттлингом
+MAX_THROTTLE_RETRIES = 2
 
 class YandexParser:
     """
@@ -16,12 +26,32 @@ class YandexParser:
         self.base_url = "https://xmlstock.com/yandex/xml/"
         self.logger = logging.getLogger(__name__)
         
+        # Одна HTTP-сессия на парсер: keep-alive соединения переиспользуются
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = settings.USER_AGENT
+        
+        # Адаптивный контроль нагрузки: REQUEST_DELAY задает стартовую частоту,
+        # дальше она подстраивается под реальную пропускную способность XMLStock
+        request_delay = getattr(settings, 'REQUEST_DELAY', 1.0)
+        self.throttle = AIMDController(
+            initial_rate=1.0 / request_delay if request_delay > 0 else 1.0,
+            max_rate=getattr(settings, 'PARSER_MAX_RPS', 5.0),
+            max_concurrency=getattr(settings, 'PARSER_MAX_CONCURRENCY', 4),
+            target_latency=getattr(settings, 'PARSER_TARGET_LATENCY', 5.0),
+        )
+        
+        # Запросы, которые выполняются прямо сейчас: (запрос, регион, страница, топ) -> Future
+        self._inflight: Dict[tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._coalesced = 0
+        
         # Проверяем API ключ
         if not self.api_key or self.api_key.startswith('test_key'):
             self.logger.warning("Используется тестовый API ключ! Замените на реальный в .env файле")
     
     def parse_queries(self, queries: List[str], region: int = 213, 
-                      max_results: int = 10) -> List[Dict]:
+                      max_results: int = 10,
+                      on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
         """
         Парсит список поисковых запросов через XMLStock API.
         
@@ -29,50 +59,130 @@ class YandexParser:
             queries: Список поисковых запросов
             region: Код региона Яндекса (213 - Москва)
             max_results: Максимальное количество результатов на запрос
+            on_result: Вызывается для каждого успешного запроса сразу после
+                получения (например, чтобы сохранить его в базу)
+            
+        Варианты написания одного запроса (см. normalize_query) запрашиваются
+        один раз, а результат возвращается для каждого исходного написания.
             
         Returns:
             Список словарей с результатами для каждого запроса
         """
         self.logger.info(f"Начинаю парсинг {len(queries)} запросов для региона {region}")
         
-        all_results = []
+        # Варианты написания одного запроса (регистр, ё/е, пробелы) запрашиваем один раз
+        indexes_by_key: Dict[str, List[int]] = {}
+        for i, query in enumerate(queries):
+            key = normalize_query(query)
+            if key:
+                indexes_by_key.setdefault(key, []).append(i)
+        if len(indexes_by_key) < len(queries):
+            self.logger.info(f"После нормализации уникальных запросов: {len(indexes_by_key)}")
+        
+        # Выставляется, если обработка прервана: новые обращения к API не начинаются
+        stop = threading.Event()
+        
+        def parse_one(key: str) -> List[SerpResult]:
+            # Парсим первую страницу выдачи
+            return self._parse_coalesced(key, region, page=0, max_results=max_results, stop=stop)
         
-        for i, query in enumerate(queries, 1):
-            self.logger.info(f"[{i}/{len(queries)}] Парсим запрос: '{query}'")
+        # Лимиты фактической нагрузки держит AIMD-контроллер, пул - лишь верхняя граница
+        results_by_index: Dict[int, Dict] = {}
+        executor = ThreadPoolExecutor(max_workers=self.throttle.max_concurrency)
+        try:
+            futures = {executor.submit(parse_one, key): key for key in indexes_by_key}
             
-            try:
-                # Парсим первую страницу выдачи
-                results = self._parse_single_query(query, region, page=0, max_results=max_results)
+            # on_result вызываем в этом потоке: сохранение в базу не должно
+            # выполняться параллельно из рабочих потоков
+            for done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    self.logger.error(f"Ошибка при парсинге запроса '{key}': {e}")
+                    # Продолжаем со следующим запросом
+                    continue
                 
-                if results:
-                    all_results.append({
-                        'query': query,
+                if not results:
+                    self.logger.warning(f"[{done}/{len(futures)}] ✗ Нет результатов для запроса: '{key}'")
+                    continue
+                
+                # Раздаем результат всем исходным написаниям запроса
+                for i in indexes_by_key[key]:
+                    query_result = {
+                        'query': queries[i],
                         'region': region,
                         'parsed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
-                        'results': results,
+                        'results': list(results),
                         'results_count': len(results)
-                    })
-                    self.logger.info(f"  ✓ Получено результатов: {len(results)}")
-                else:
-                    self.logger.warning(f"  ✗ Нет результатов для запроса: '{query}'")
-                
-                # Соблюдаем задержку между запросами (если указана в настройках)
-                if hasattr(self.settings, 'REQUEST_DELAY') and i < len(queries):
-                    delay = self.settings.REQUEST_DELAY
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                self.logger.error(f"Ошибка при парсинге запроса '{query}': {e}")
-                # Продолжаем со следующим запросом
-                continue
+                    }
+                    results_by_index[i] = query_result
+                    if on_result:
+                        on_result(query_result)
+                self.logger.info(f"[{done}/{len(futures)}] ✓ '{key}': {len(results)} результатов")
+        except BaseException:
+            # Ошибка в on_result (например, записи в базу) или Ctrl+C: не тратим
+            # запросы API на результаты, которые уже некуда сохранить
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.logger.warning("Парсинг прерван, оставшиеся запросы отменены")
+            raise
+        executor.shutdown()
+        
+        # Возвращаем в исходном порядке запросов
+        all_results = [results_by_index[i] for i in sorted(results_by_index)]
         
         self.logger.info(f"Парсинг завершен. Успешно обработано: {len(all_results)}/{len(queries)} запросов")
+        self.logger.info(f"Лимиты XMLStock: {self.throttle.stats()}")
         return all_results
     
+    def get_stats(self) -> Dict:
+        """Текущие лимиты и счетчики контроллера нагрузки и объединения запросов."""
+        return {**self.throttle.stats(), 'coalesced': self._coalesced}
+    
+    def _parse_coalesced(self, query: str, region: int, page: int = 0,
+                         max_results: int = 10,
+                         stop: Optional[threading.Event] = None) -> List[SerpResult]:
+        """
+        _parse_single_query с объединением одинаковых запросов "в полете":
+        если такой же (запрос, регион, страница) уже выполняется в другом
+        потоке (другая задача, другой регион с общими ключами), ждем его
+        результат вместо второго обращения к API.
+        """
+        key = (normalize_query(query), region, page, max_results)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._coalesced += 1
+        
+        if not owner:
+            return list(future.result())
+        
+        try:
+            results = self._parse_single_query(key[0], region, page=page, max_results=max_results,
+                                               stop=stop)
+            future.set_result(results)
+            return results
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+    
     def _parse_single_query(self, query: str, region: int, page: int = 0, 
-                           max_results: int = 10) -> List[Dict]:
+                           max_results: int = 10,
+                           stop: Optional[threading.Event] = None) -> List[SerpResult]:
         """
         Парсит одну страницу результатов для одного запроса.
+        
+        Каждый HTTP запрос проходит через AIMD-контроллер; при троттлинге
+        запрос повторяется (контроллер к этому моменту уже снизил частоту).
+        Выставленный stop отменяет запрос до обращения к API.
         """
         params = {
             'user': self.settings.XMLSTOCK_USER,
@@ -83,62 +193,95 @@ class YandexParser:
             'groupby': 'attr=d.mode%3Ddeep.groups-on-page%3D10.docs-in-group%3D1'
         }
         
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            if stop is not None and stop.is_set():
+                return []
+            self.throttle.acquire()
+            started = time.monotonic()
+            status_code, xml_error, failed = None, None, False
+            try:
+                response = self.session.get(
+                    self.base_url,
+                    params=params,
+                    timeout=30  # 30 секунд таймаут
+                )
+                status_code = response.status_code
+                
+                if status_code in HTTP_THROTTLE_STATUSES:
+                    self.logger.warning(f"XMLStock ограничивает запросы (HTTP {status_code}) для '{query}'")
+                    continue
+                
+                response.raise_for_status()  # Проверяем HTTP ошибки
+                
+                # Парсим XML и проверяем код ошибки в теле ответа
+                root = ET.fromstring(response.content)
+                xml_error = self._get_error_code(root)
+                if xml_error in XML_THROTTLE_CODES:
+                    self.logger.warning(f"XMLStock ограничивает запросы (код {xml_error}) для '{query}'")
+                    continue
+                if xml_error is not None and xml_error != XML_ERROR_NO_RESULTS:
+                    self.logger.error(f"Ошибка XMLStock (код {xml_error}) для '{query}'")
+                    return []
+                
+                return self._parse_xml_root(root, max_results)
+                
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Сетевая ошибка для запроса '{query}': {e}")
+                return []
+            except Exception as e:
+                self.logger.error(f"Ошибка парсинга XML для '{query}': {e}")
+                failed = True
+                return []
+            finally:
+                self.throttle.release(time.monotonic() - started, status_code, xml_error, error=failed)
+        
+        self.logger.error(f"Запрос '{query}' не выполнен: XMLStock продолжает ограничивать")
+        return []
+    
+    def _get_error_code(self, root) -> Optional[int]:
+        """Код ошибки из <error code="..."> в ответе, если есть."""
+        error = root.find('.//error')
+        if error is None:
+            return None
         try:
-            response = requests.get(
-                self.base_url,
-                params=params,
-                headers={'User-Agent': self.settings.USER_AGENT},
-                timeout=30  # 30 секунд таймаут
-            )
-            
-            response.raise_for_status()  # Проверяем HTTP ошибки
-            
-            # Парсим XML
-            results = self._parse_xml_response(response.content, max_results)
-            return results
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Сетевая ошибка для запроса '{query}': {e}")
-            return []
-        except Exception as e:
-            self.logger.error(f"Ошибка парсинга XML для '{query}': {e}")
-            return []
+            return int(error.get('code', 0))
+        except ValueError:
+            return 0
     
-    def _parse_xml_response(self, xml_content: bytes, max_results: int = 10) -> List[Dict]:
+    def _parse_xml_response(self, xml_content: bytes, max_results: int = 10) -> List[SerpResult]:
         """
         Парсит XML ответ от XMLStock API.
         
         Возвращает топ-N результатов с позициями и URL.
         """
         try:
-            root = ET.fromstring(xml_content)
-            results = []
-            
-            # Ищем все документы в ответе
-            for i, doc in enumerate(root.findall('.//doc'), 1):
-                if i > max_results:
-                    break
-                
-                result = {
-                    'position': i,
-                    'url': self._get_element_text(doc, 'url'),
-                    'title': self._get_element_text(doc, 'title'),
-                    'domain': self._get_element_text(doc, 'domain'),
-                    'description': self._get_description(doc)
-                }
-                
-                # Очищаем URL от лишнего
-                if result['url']:
-                    result['url'] = result['url'].strip()
-                
-                results.append(result)
-            
-            return results
-            
+            return self._parse_xml_root(ET.fromstring(xml_content), max_results)
         except ET.ParseError as e:
             self.logger.error(f"Ошибка парсинга XML: {e}")
             return []
     
+    def _parse_xml_root(self, root, max_results: int = 10) -> List[SerpResult]:
+        """Извлекает топ-N результатов из разобранного XML."""
+        results = []
+        
+        # Ищем все документы в ответе
+        for i, doc in enumerate(root.findall('.//doc'), 1):
+            if i > max_results:
+                break
+            
+            url = self._get_element_text(doc, 'url')
+            result = SerpResult(
+                position=i,
+                url=url.strip() if url else '',  # Очищаем URL от лишнего
+                title=self._get_element_text(doc, 'title'),
+                domain=self._get_element_text(doc, 'domain'),
+                description=self._get_description(doc)
+            )
+            
+            results.append(result)
+        
+        return results
+    
     def _get_element_text(self, element, tag_name: str, default: str = '') -> str:
         """Безопасное извлечение текста из XML элемента."""
         elem = element.find(tag_name)
@@ -182,7 +325,7 @@ class YandexParser:
                 'page': 0
             }
             
-            response = requests.get(
+            response = self.session.get(
                 self.base_url,
                 params=params,
                 timeout=10
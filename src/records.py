@@ -0,0 +1,186 @@
+# src/records.py
+"""
+Компактное представление результатов выдачи.
+
+SerpResult - запись одной позиции на __slots__ (без словаря на каждый
+объект), SessionFrame - колонки всей сессии на массивах с общими
+таблицами запросов, доменов и URL. Оба поддерживают доступ как к словарю
+(result['url'], result.get('domain', '')), чтобы код, написанный под
+словари, продолжал работать.
+"""
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+RESULT_FIELDS = ('position', 'url', 'title', 'domain', 'description')
+
+class SerpResult:
+    """Одна позиция выдачи."""
+    __slots__ = RESULT_FIELDS
+
+    def __init__(self, position: int, url: str = '', title: str = '',
+                 domain: str = '', description: str = ''):
+        self.position = position
+        self.url = url or ''
+        self.title = title or ''
+        # Домены повторяются тысячи раз - храним одну копию строки
+        self.domain = sys.intern(domain) if domain else ''
+        self.description = description or ''
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SerpResult':
+        return cls(**{field: data.get(field, '') for field in RESULT_FIELDS})
+
+    # --- Совместимость со словарями ---------------------------------
+
+    def __getitem__(self, key: str):
+        if key not in RESULT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        if key not in RESULT_FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def keys(self) -> Tuple[str, ...]:
+        return RESULT_FIELDS
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in RESULT_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, SerpResult):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"SerpResult({self.position}, {self.domain!r}, {self.url!r})"
+
+class ValueTable:
+    """
+    Таблица строк: каждое значение хранится один раз и получает id по порядку.
+
+    Одну таблицу можно передать нескольким фреймам - тогда id URL
+    совпадают между сессиями и их не нужно перекодировать для сравнения.
+    """
+    __slots__ = ('values', '_ids')
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def id_of(self, value: str) -> int:
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+class SessionFrame:
+    """
+    Результаты сессии в колонках.
+
+    Запросы, домены и URL хранятся один раз в таблицах, строки ссылаются
+    на них целочисленными id (array), позиции - array('H'). Таблица URL
+    может быть общей для нескольких фреймов (url_table). Строки ожидаются
+    отсортированными по (query, position), как их отдает Database.
+    """
+
+    def __init__(self, session_id: Optional[int] = None, url_table: Optional[ValueTable] = None):
+        self.session_id = session_id
+        self.queries: List[str] = []
+        self.domains: List[str] = []
+        self._query_ids: Dict[str, int] = {}
+        self._domain_ids: Dict[str, int] = {}
+        self.url_table = url_table if url_table is not None else ValueTable()
+
+        self.query_id = array('I')
+        self.domain_id = array('I')
+        self.url_id = array('I')
+        self.position = array('H')
+        self.title: List[str] = []
+        self.description: List[str] = []
+
+        self._slices: Optional[Dict[int, Tuple[int, int]]] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], session_id: Optional[int] = None,
+                  url_table: Optional[ValueTable] = None) -> 'SessionFrame':
+        """Строит фрейм из кортежей (query, position, url, title, domain, description)."""
+        frame = cls(session_id, url_table)
+        for query, position, url, title, domain, description in rows:
+            frame._append(query, position, url, title, domain, description)
+        return frame
+
+    def append(self, query: str, result) -> None:
+        """Добавляет результат (SerpResult или словарь) для запроса."""
+        self._append(query, result['position'], result['url'], result.get('title', ''),
+                     result.get('domain', ''), result.get('description', ''))
+
+    def _append(self, query, position, url, title, domain, description):
+        query_id = self._query_ids.get(query)
+        if query_id is None:
+            query_id = self._query_ids[query] = len(self.queries)
+            self.queries.append(query)
+
+        domain = domain or ''
+        domain_id = self._domain_ids.get(domain)
+        if domain_id is None:
+            domain_id = self._domain_ids[domain] = len(self.domains)
+            self.domains.append(sys.intern(domain))
+
+        self.query_id.append(query_id)
+        self.domain_id.append(domain_id)
+        self.url_id.append(self.url_table.id_of(url or ''))
+        self.position.append(position)
+        self.title.append(title or '')
+        self.description.append(description or '')
+        self._slices = None
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    @property
+    def url(self) -> List[str]:
+        """Колонка URL строками."""
+        values = self.url_table.values
+        return [values[url_id] for url_id in self.url_id]
+
+    def _query_slices(self) -> Dict[int, Tuple[int, int]]:
+        """Диапазоны строк по запросам (строится один раз)."""
+        if self._slices is None:
+            slices: Dict[int, Tuple[int, int]] = {}
+            for row, query_id in enumerate(self.query_id):
+                start, _ = slices.get(query_id, (row, row))
+                slices[query_id] = (start, row + 1)
+            self._slices = slices
+        return self._slices
+
+    def record(self, row: int) -> SerpResult:
+        """Строка фрейма как SerpResult."""
+        return SerpResult(
+            self.position[row], self.url_table.values[self.url_id[row]], self.title[row],
+            self.domains[self.domain_id[row]], self.description[row]
+        )
+
+    def for_query(self, query: str, limit: Optional[int] = None) -> List[SerpResult]:
+        """Результаты одного запроса по возрастанию позиции."""
+        query_id = self._query_ids.get(query)
+        if query_id is None:
+            return []
+        start, stop = self._query_slices()[query_id]
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return [self.record(row) for row in range(start, stop)]
+
+    def iter_dicts(self) -> Iterator[Dict]:
+        """Строки как словари (с ключом query) - для совместимости."""
+        for row in range(len(self)):
+            data = self.record(row).to_dict()
+            data['query'] = self.queries[self.query_id[row]]
+            yield data
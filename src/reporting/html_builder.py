@@ -1,16 +1,18 @@
 # src/reporting/html_builder.py
 from datetime import datetime, timedelta
-from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import logging
-from src.storage.database import Database
+from src.storage.database import Database, normalize_domain
 
 class HTMLBuilder:
     """Генератор HTML отчетов в формате таблицы."""
     
-    def __init__(self, settings):
+    def __init__(self, settings, db: 'Database' = None):
         self.settings = settings
+        self.db = db
         self.logger = logging.getLogger(__name__)
+        self.target_domain = normalize_domain(settings.TARGET_DOMAIN)
+        self.competitor_domains = {normalize_domain(d) for d in settings.COMPETITOR_DOMAINS}
     
     def generate_report(self, days_back: int = 2) -> str:
         """
@@ -24,8 +26,8 @@ class HTMLBuilder:
         """
         self.logger.info(f"Генерация отчета за последние {days_back} дней")
         
-        # Получаем данные из базы
-        db = Database(self.settings)
+        # Получаем данные из базы (переиспользуем готовое соединение, если передано)
+        db = self.db or Database(self.settings)
         
         # Получаем последние сессии
         sessions = self._get_last_sessions(db, days_back)
@@ -37,10 +39,10 @@ class HTMLBuilder:
         queries = self._get_all_queries(db)
         
         # Формируем данные для таблицы
-        table_data = self._prepare_table_data(db, sessions, queries)
+        table_data, carried = self._prepare_table_data(db, sessions, queries)
         
         # Генерация HTML
-        html_content = self._build_html(sessions, queries, table_data)
+        html_content = self._build_html(sessions, queries, table_data, carried)
         
         # Сохраняем файл
         report_path = self._save_html(html_content)
@@ -49,60 +51,78 @@ class HTMLBuilder:
     
     def _get_last_sessions(self, db: 'Database', days_back: int) -> List[Dict]:
         """Получает последние сессии за указанное количество дней."""
-        # Берем все сессии (или большой лимит)
-        all_sessions = db.get_last_sessions(limit=100)
-        
-        # Сортируем от новых к старым
-        sorted_sessions = sorted(
-            all_sessions,
-            key=lambda x: x['created_at'],
-            reverse=True
-        )
-        
-        # Если нужны сессии за последние N дней
+        # Если нужны сессии за последние N дней - фильтруем в SQL
         if days_back > 0:
             cutoff_date = datetime.now() - timedelta(days=days_back)
-            recent_sessions = []
-            for session in sorted_sessions:
-                session_date = datetime.strptime(session['created_at'], '%Y-%m-%d %H:%M:%S.%f')
-                if session_date >= cutoff_date:
-                    recent_sessions.append(session)
-            return recent_sessions
+            return db.get_sessions_since(cutoff_date)
         
-        # Или все сессии
-        return sorted_sessions
+        # Или все сессии (большой лимит), от новых к старым
+        return db.get_last_sessions(limit=100)
     
     def _get_all_queries(self, db: 'Database') -> List[str]:
-        """Получает все уникальные запросы из базы."""
-        # В простой реализации - читаем из файла queries.txt
-        queries_file = Path(__file__).parent.parent.parent / 'config' / 'queries.txt'
-        with open(queries_file, 'r', encoding='utf-8') as f:
-            queries = [line.strip() for line in f if line.strip()]
+        """Получает все уникальные запросы (из queries.txt, без вариантов написания)."""
+        from src.jobs import load_queries
         
-        return queries
+        return load_queries()
     
-    def _prepare_table_data(self, db: 'Database', sessions: List[Dict], queries: List[str]) -> Dict:
-        """Подготавливает данные для таблицы."""
+    def _prepare_table_data(self, db: 'Database', sessions: List[Dict],
+                            queries: List[str]) -> Tuple[Dict, Dict]:
+        """
+        Подготавливает данные для таблицы.
+        
+        Returns:
+            (данные таблицы, {(запрос, дата сессии): дата проверки, с которой
+             перенесены результаты непроверявшегося в сессии запроса})
+        """
+        # Одна выборка на сессию в компактном колоночном виде
+        frames = {session['id']: db.get_session_frame(session['id']) for session in sessions}
+        skipped = {session['id']: db.get_skipped_queries(session['id']) for session in sessions}
+        
+        # Источники перенесенных результатов могут быть старше периода отчета
+        source_dates = {session['id']: session['created_at'] for session in sessions}
+        for source_id in {sid for by_query in skipped.values() for sid in by_query.values() if sid}:
+            if source_id not in frames:
+                source = db.get_session(source_id)
+                if source:
+                    frames[source_id] = db.get_session_frame(source_id)
+                    source_dates[source_id] = source['created_at']
+        
         table_data = {}
+        carried = {}
         
         for query in queries:
             table_data[query] = {}
             
             for session in sessions:
-                session_id = session['id']
                 date_key = session['created_at']  # Полная дата-время (с миллисекундами)
+                session_id = session['id']
                 
-                # Получаем результаты для этого запроса и сессии
-                all_results = db.get_session_results(session_id)
-                query_results = [r for r in all_results if r['query'] == query]
+                # Запрос не перепроверялся - показываем последние известные результаты
+                source_id = skipped[session_id].get(query)
+                if source_id in frames:
+                    carried[(query, date_key)] = source_dates[source_id]
+                    session_id = source_id
                 
                 # Ограничиваем 10 результатами
-                table_data[query][date_key] = query_results[:10]
+                table_data[query][date_key] = frames[session_id].for_query(query, limit=10)
         
-        return table_data
+        return table_data, carried
     
-    def _build_html(self, sessions: List[Dict], queries: List[str], table_data: Dict) -> str:
+    def _domain_class(self, domain: str) -> str:
+        """CSS класс для подсветки целевого домена (и его поддоменов) и конкурентов."""
+        domain = normalize_domain(domain)
+        if not domain:
+            return ""
+        if domain == self.target_domain or domain.endswith('.' + self.target_domain):
+            return "target-domain"
+        if domain in self.competitor_domains:
+            return "competitor-domain"
+        return ""
+    
+    def _build_html(self, sessions: List[Dict], queries: List[str], table_data: Dict,
+                    carried: Optional[Dict] = None) -> str:
         """Создает HTML контент на основе вашего шаблона."""
+        carried = carried or {}
         
         # Подготавливаем даты для заголовков
         date_headers = []
@@ -120,11 +140,20 @@ class HTMLBuilder:
             date_only = session['created_at'].split()[0]  # Берем только дату
             unique_dates.add(date_only)
         
+        # Сколько запросов с нашим доменом в топ-10 по последней проверке
+        target_in_top10 = 0
+        if sessions:
+            latest_key = sessions[0]['created_at']
+            for query in queries:
+                latest_results = table_data[query].get(latest_key, [])
+                if any(self._domain_class(r.get('domain', '')) == "target-domain" for r in latest_results):
+                    target_in_top10 += 1
+        
         stats = {
             'keywords_count': len(queries),
             'sessions_count': len(sessions),  # Количество проверок
             'days_count': len(unique_dates),  # Количество дней
-            'domains_in_top10': 0,
+            'domains_in_top10': target_in_top10,
         }
         
         # Генерируем строки таблицы
@@ -138,13 +167,20 @@ class HTMLBuilder:
             
             row_class = "even" if i % 2 == 0 else "odd"
             
+            # Дата последней реальной проверки (сессии идут от новых к старым)
+            last_checked = next(
+                (s['created_at'] for s in sessions if (query, s['created_at']) not in carried),
+                carried.get((query, sessions[0]['created_at'])) if sessions else None
+            )
+            last_checked = last_checked.split()[0] if last_checked else datetime.now().strftime('%Y-%m-%d')
+            
             # Начинаем строку
             table_rows += f"""
                     <tr class="{row_class}">
                         <td class="keyword-cell">
                             <div style="font-weight: 500;">{query}</div>
                             <div style="font-size: 11px; color: #6c757d; margin-top: 4px;">
-                                Последняя проверка: {datetime.now().strftime('%Y-%m-%d')}<br>
+                                Последняя проверка: {last_checked}<br>
                                 Уникальных доменов: {len(all_domains)}
                             </div>
                         </td>"""
@@ -154,11 +190,16 @@ class HTMLBuilder:
                 # Берем оригинальную дату из сессии (без времени) для поиска в table_data
                 date_key = session['created_at']
                 results = table_data[query].get(date_key, [])
+                carried_from = carried.get((query, date_key))
                 
                 table_rows += f"""
-                        <td>
+                        <td{' class="carried-cell"' if carried_from else ''}>
                             <div class="competitor-list">"""
                 
+                if carried_from:
+                    table_rows += f"""
+                                <div class="carried-note">↻ не перепроверялся, данные от {carried_from[:16]}</div>"""
+                
                 if results:
                     for result in results:
                         position = result['position']
@@ -175,10 +216,8 @@ class HTMLBuilder:
                         elif position == 3:
                             position_class = "position-3"
                         
-                        # Определяем CSS класс для подсветки целевого домена
-                        target_domain_class = ""
-                        if domain and 'aquamoney.by' in domain.lower():
-                            target_domain_class = "target-domain"
+                        # Определяем CSS класс для подсветки целевого домена и конкурентов
+                        target_domain_class = self._domain_class(domain)
                         
                         table_rows += f"""
                                 <div class="competitor-item {position_class}">
@@ -208,6 +247,8 @@ class HTMLBuilder:
             days_count=stats['days_count'],
             sessions_count=stats['sessions_count'],
             keywords_count=stats['keywords_count'],
+            domains_in_top10=stats['domains_in_top10'],
+            target_domain=self.target_domain,
             date_headers="\n                        ".join(
                 [f'<th class="date-header">{date}</th>' for date in date_headers]
             ),
@@ -253,8 +294,8 @@ class HTMLBuilder:
                 <div class="stat-label">Дней отслеживания</div>
             </div>
             <div class="stat-item">
-                <div class="stat-value">0</div>
-                <div class="stat-label">Наш домен в топ-10</div>
+                <div class="stat-value">{domains_in_top10}</div>
+                <div class="stat-label">{target_domain} в топ-10</div>
             </div>
         </div>
         
@@ -291,6 +332,10 @@ class HTMLBuilder:
                     <div class="legend-color" style="background-color: #6c757d;"></div>
                     <span>4-10 позиции</span>
                 </div>
+                <div class="legend-item">
+                    <div class="legend-color carried-cell" style="border: 1px solid #dee2e6;"></div>
+                    <span>↻ запрос не перепроверялся (стабильная выдача)</span>
+                </div>
             </div>
         </div>
     </div>
@@ -325,6 +370,7 @@ class HTMLBuilder:
         """Сохраняет HTML контент в файл."""
         report_filename = f"seo_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
         report_path = self.settings.REPORTS_DIR / report_filename
+        report_path.parent.mkdir(exist_ok=True)
         
         with open(report_path, 'w', encoding='utf-8') as f:
             f.write(html_content)
@@ -1,24 +1,95 @@
 # src/storage/database.py
 import sqlite3
 from pathlib import Path
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import logging
+from src.records import SerpResult, SessionFrame, ValueTable
+
+# Схема таблицы результатов общая для основного файла и помесячных архивов
+RESULTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {schema}results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        query TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        domain TEXT,
+        description TEXT,
+        FOREIGN KEY (session_id) REFERENCES sessions (id),
+        UNIQUE(session_id, query, position)
+    )
+'''
+
+# Нормализация домена в SQL: нижний регистр и без "www."
+NORMALIZED_DOMAIN_SQL = (
+    "CASE WHEN lower(trim(domain)) LIKE 'www.%' "
+    "THEN substr(lower(trim(domain)), 5) ELSE lower(trim(domain)) END"
+)
+
+# Сколько ждать снятия блокировки записи другим соединением (сек)
+BUSY_TIMEOUT = 30
+
+def normalize_domain(domain: str) -> str:
+    """Приводит домен к виду, в котором он хранится в domain_index."""
+    domain = (domain or '').strip().lower()
+    return domain[4:] if domain.startswith('www.') else domain
+
+class ArchiveMissingError(FileNotFoundError):
+    """Сессии помечены архивом, но его файла нет (удален или не перенесен)."""
 
 class Database:
     """Простое хранилище для SEO данных."""
     
-    def __init__(self, settings):
+    # Пути баз, для которых схема уже проверена в этом процессе
+    _initialized_paths = set()
+    
+    def __init__(self, settings, persistent: bool = False):
+        """
+        Args:
+            settings: настройки проекта
+            persistent: держать одно открытое соединение (для долгоживущих
+                процессов); по умолчанию каждый метод открывает свое
+        """
         self.settings = settings
         self.db_path = Path(settings.DATABASE_URL.replace('sqlite:///', ''))
         self.logger = logging.getLogger(__name__)
+        self._conn = None
+        if persistent:
+            self.db_path.parent.mkdir(exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
         self._init_db()
     
+    def connect(self) -> sqlite3.Connection:
+        """
+        Соединение с базой: постоянное (persistent=True) или новое.
+        
+        Используется как `with db.connect() as conn:` - контекст
+        коммитит транзакцию, но не закрывает соединение.
+        """
+        if self._conn is not None:
+            self._conn.row_factory = None
+            return self._conn
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+    
+    def close(self):
+        """Закрывает постоянное соединение, если оно открыто."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
     def _init_db(self):
-        """Создает таблицы если их нет."""
+        """Создает таблицы если их нет (один раз на процесс для каждого файла)."""
+        if self.db_path in Database._initialized_paths and self.db_path.exists():
+            return
         self.db_path.parent.mkdir(exist_ok=True)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
+            # WAL: читатели (отчеты, API) не блокируют писателя и наоборот.
+            # Режим сохраняется в файле базы
+            conn.execute('PRAGMA journal_mode=WAL')
             cursor = conn.cursor()
             
             # Таблица сессий парсинга
@@ -27,37 +98,140 @@ class Database:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     created_at TIMESTAMP NOT NULL,
                     region INTEGER NOT NULL,
-                    search_engine TEXT DEFAULT 'yandex'
+                    search_engine TEXT DEFAULT 'yandex',
+                    archive TEXT,
+                    completed_at TIMESTAMP
                 )
             ''')
+            # Колонки archive и completed_at добавлены позже - мигрируем старые базы
+            self._ensure_column(cursor, 'sessions', 'archive', 'TEXT')
+            if self._ensure_column(cursor, 'sessions', 'completed_at', 'TIMESTAMP'):
+                # Сессии до миграции считаем завершенными, иначе resume
+                # дописал бы в них новые данные, а экспорт их пропускал
+                cursor.execute('UPDATE sessions SET completed_at = created_at WHERE completed_at IS NULL')
             
             # Таблица результатов поиска
+            self._create_results_table(cursor)
+            
+            # Дневные агрегаты по архивированным сессиям:
+            # лучшая позиция домена по запросу за день
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                CREATE TABLE IF NOT EXISTS daily_positions (
+                    query TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    day DATE NOT NULL,
+                    region INTEGER NOT NULL,
+                    best_position INTEGER NOT NULL,
+                    sessions_count INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (query, domain, day, region)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Инвертированный индекс домен -> (сессия, запрос, позиция).
+            # Ведется при записи результатов и покрывает только "горячие" сессии
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS domain_index (
+                    domain TEXT NOT NULL,
                     session_id INTEGER NOT NULL,
                     query TEXT NOT NULL,
                     position INTEGER NOT NULL,
-                    url TEXT NOT NULL,
-                    title TEXT,
-                    domain TEXT,
-                    description TEXT,
-                    FOREIGN KEY (session_id) REFERENCES sessions (id),
-                    UNIQUE(session_id, query, position)
-                )
+                    PRIMARY KEY (domain, session_id, query)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_domain_index_session '
+                'ON domain_index(session_id, query, position)'
+            )
+            
+            # Запросы, пропущенные в сессии адаптивным планировщиком перепроверок,
+            # и сессия, из которой в отчете берутся их последние известные результаты
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS skipped_queries (
+                    session_id INTEGER NOT NULL,
+                    query TEXT NOT NULL,
+                    source_session_id INTEGER,
+                    PRIMARY KEY (session_id, query)
+                ) WITHOUT ROWID
             ''')
             
             # Индексы для быстрого поиска
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_session_date ON sessions(created_at)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_session ON results(session_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_query ON results(query)')
+            
+            # Базы, созданные до появления индекса доменов, заполняем один раз
+            if cursor.execute('SELECT 1 FROM domain_index LIMIT 1').fetchone() is None:
+                self._index_domains(cursor, '1 = 1', ())
             
             conn.commit()
+        Database._initialized_paths.add(self.db_path)
         self.logger.info(f"База данных инициализирована: {self.db_path}")
     
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, definition: str) -> bool:
+        """Добавляет колонку в существующую таблицу, если её ещё нет (True - добавлена)."""
+        columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+        if column in columns:
+            return False
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
+    
+    @staticmethod
+    def _create_results_table(cursor, schema: str = ''):
+        """Создает таблицу results и её индексы (schema - 'arch.' для архива)."""
+        cursor.execute(RESULTS_TABLE_SQL.format(schema=schema))
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}idx_results_session ON results(session_id)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}idx_results_query ON results(query)')
+    
+    @staticmethod
+    def _index_domains(cursor, where: str, params: tuple):
+        """Пересобирает строки domain_index для результатов, подходящих под условие."""
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO domain_index (domain, session_id, query, position)
+            SELECT {NORMALIZED_DOMAIN_SQL}, session_id, query, MIN(position)
+            FROM results
+            WHERE {where} AND domain IS NOT NULL AND trim(domain) != ''
+            GROUP BY 1, session_id, query
+        ''', params)
+    
+    def archive_path(self, archive: str) -> Path:
+        """Путь к помесячному архиву ('2026_01' -> data/archive/seo_2026_01.db)."""
+        return self.db_path.parent / 'archive' / f'seo_{archive}.db'
+    
+    @contextmanager
+    def _results_table(self, conn, archive: Optional[str], create: bool = False):
+        """
+        Возвращает имя таблицы с результатами: основной или подключенного архива.
+        
+        Архив подключается через ATTACH только на время запроса,
+        поэтому запросы к свежим данным не трогают архивные файлы.
+        Отсутствующий архив создается только при create=True (перенос
+        сессий), иначе - ArchiveMissingError, а не пустой файл.
+        """
+        if not archive:
+            yield 'results'
+            return
+        
+        path = self.archive_path(archive)
+        if not create and not path.exists():
+            raise ArchiveMissingError(f"Архив {path} не найден (сессии помечены архивом '{archive}')")
+        
+        conn.execute('ATTACH DATABASE ? AS arch', (str(self.archive_path(archive)),))
+        try:
+            yield 'arch.results'
+        finally:
+            conn.execute('DETACH DATABASE arch')
+    
+    def _archives_desc(self, conn) -> List[str]:
+        """Список архивов, в которые вынесены сессии, от новых к старым."""
+        cursor = conn.execute('''
+            SELECT DISTINCT archive FROM sessions 
+            WHERE archive IS NOT NULL 
+            ORDER BY archive DESC
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+    
     def create_session(self, region: int, search_engine: str = 'yandex') -> int:
         """Создает новую сессию парсинга и возвращает её ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 'INSERT INTO sessions (created_at, region, search_engine) VALUES (?, ?, ?)',
@@ -69,20 +243,126 @@ class Database:
         self.logger.info(f"Создана сессия #{session_id} для региона {region}")
         return session_id
     
-    def save_results(self, session_id: int, query: str, results: List[Dict]):
-        """Сохраняет результаты для одного запроса в сессии."""
-        if not results:
+    def complete_session(self, session_id: int):
+        """Отмечает сессию завершенной (все запросы обработаны)."""
+        with self.connect() as conn:
+            conn.execute(
+                'UPDATE sessions SET completed_at = ? WHERE id = ?',
+                (datetime.now(), session_id)
+            )
+            conn.commit()
+    
+    def get_session(self, session_id: int) -> Optional[Dict]:
+        """Возвращает сессию по ID или None."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            return dict(row) if row else None
+    
+    def get_incomplete_session(self) -> Optional[Dict]:
+        """Последняя незавершенная (прерванная) сессия или None."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('''
+                SELECT * FROM sessions 
+                WHERE completed_at IS NULL 
+                ORDER BY created_at DESC 
+                LIMIT 1
+            ''').fetchone()
+            return dict(row) if row else None
+    
+    def get_completed_sessions(self) -> List[Dict]:
+        """Все завершенные сессии от старых к новым."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute('''
+                SELECT * FROM sessions 
+                WHERE completed_at IS NOT NULL 
+                ORDER BY created_at
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_session_queries(self, session_id: int) -> List[str]:
+        """Запросы, по которым в сессии уже сохранены результаты."""
+        with self.connect() as conn:
+            row = conn.execute('SELECT archive FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            archive = row[0] if row else None
+            
+            with self._results_table(conn, archive) as table:
+                cursor = conn.execute(
+                    f'SELECT DISTINCT query FROM {table} WHERE session_id = ?',
+                    (session_id,)
+                )
+                return [row[0] for row in cursor.fetchall()]
+    
+    def save_skipped_queries(self, session_id: int, skipped: Dict[str, Optional[int]]):
+        """
+        Запоминает запросы, пропущенные в сессии.
+        
+        Args:
+            skipped: {запрос: ID сессии с последними известными результатами}
+        """
+        if not skipped:
+            return
+        with self.connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO skipped_queries (session_id, query, source_session_id) '
+                'VALUES (?, ?, ?)',
+                [(session_id, query, source) for query, source in skipped.items()]
+            )
+            conn.commit()
+    
+    def get_skipped_queries(self, session_id: int) -> Dict[str, Optional[int]]:
+        """Пропущенные в сессии запросы: {запрос: ID сессии-источника результатов}."""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                'SELECT query, source_session_id FROM skipped_queries WHERE session_id = ?',
+                (session_id,)
+            )
+            return dict(cursor.fetchall())
+    
+    def get_recent_top_urls(self, since: datetime, region: int, top_n: int = 10) -> List[tuple]:
+        """
+        URL из топ-N по всем запросам для сессий региона, начиная с даты (только горячие данные).
+        
+        Returns:
+            Кортежи (query, session_id, created_at, url), упорядоченные
+            по запросу, дате сессии и позиции
+        """
+        with self.connect() as conn:
+            cursor = conn.execute('''
+                SELECT r.query, r.session_id, s.created_at, r.url
+                FROM results r
+                JOIN sessions s ON r.session_id = s.id
+                WHERE s.created_at >= ? AND s.region = ? AND r.position <= ?
+                ORDER BY r.query, s.created_at, r.position
+            ''', (since, region, top_n))
+            return cursor.fetchall()
+    
+    def save_results(self, session_id: int, query: str, results: List[SerpResult]):
+        """Сохраняет результаты (SerpResult или словари) для одного запроса в сессии."""
+        self.save_results_batch([(session_id, query, results)])
+    
+    def save_results_batch(self, batches: List[Tuple[int, str, List[SerpResult]]]):
+        """
+        Сохраняет результаты нескольких запросов одной транзакцией.
+        
+        Args:
+            batches: список (session_id, query, results)
+        """
+        batches = [batch for batch in batches if batch[2]]
+        if not batches:
             return
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.cursor()
             
-            for result in results:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO results 
-                    (session_id, query, position, url, title, domain, description)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+            cursor.executemany('''
+                INSERT OR REPLACE INTO results 
+                (session_id, query, position, url, title, domain, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
                     session_id,
                     query,
                     result['position'],
@@ -90,29 +370,65 @@ class Database:
                     result.get('title', ''),
                     result.get('domain', ''),
                     result.get('description', '')
-                ))
+                )
+                for session_id, query, results in batches
+                for result in results
+            ])
+            
+            # Обновляем индекс доменов в той же транзакции
+            for session_id, query, _ in batches:
+                cursor.execute(
+                    'DELETE FROM domain_index WHERE session_id = ? AND query = ?',
+                    (session_id, query)
+                )
+                self._index_domains(cursor, 'session_id = ? AND query = ?', (session_id, query))
             
             conn.commit()
         
-        self.logger.debug(f"Сохранено {len(results)} результатов для запроса '{query}'")
+        total = sum(len(results) for _, _, results in batches)
+        self.logger.debug(f"Сохранено {total} результатов для {len(batches)} запросов")
     
     def get_session_results(self, session_id: int) -> List[Dict]:
         """Возвращает все результаты сессии."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            row = conn.execute('SELECT archive FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            archive = row['archive'] if row else None
             
-            cursor.execute('''
-                SELECT * FROM results 
-                WHERE session_id = ? 
-                ORDER BY query, position
-            ''', (session_id,))
+            with self._results_table(conn, archive) as table:
+                cursor = conn.execute(f'''
+                    SELECT * FROM {table} 
+                    WHERE session_id = ? 
+                    ORDER BY query, position
+                ''', (session_id,))
+                
+                return [dict(row) for row in cursor.fetchall()]
+    
+    def get_session_frame(self, session_id: int, url_table: Optional[ValueTable] = None) -> SessionFrame:
+        """
+        Все результаты сессии в компактном колоночном виде.
+        
+        В отличие от get_session_results не создает словарь на каждую строку -
+        для отчетов и аналитики по большим сессиям. url_table - общая
+        таблица URL для нескольких фреймов (см. SessionFrame).
+        """
+        with self.connect() as conn:
+            row = conn.execute('SELECT archive FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            archive = row[0] if row else None
             
-            return [dict(row) for row in cursor.fetchall()]
+            with self._results_table(conn, archive) as table:
+                cursor = conn.execute(f'''
+                    SELECT query, position, url, title, domain, description 
+                    FROM {table} 
+                    WHERE session_id = ? 
+                    ORDER BY query, position
+                ''', (session_id,))
+                
+                return SessionFrame.from_rows(cursor, session_id=session_id, url_table=url_table)
     
     def get_last_sessions(self, limit: int = 10) -> List[Dict]:
         """Возвращает последние сессии."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -124,19 +440,106 @@ class Database:
             
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_data_version(self) -> tuple:
+        """
+        Дешевый "отпечаток" состояния базы: меняется при появлении
+        новой сессии, новых результатов или завершении сессии.
+        """
+        with self.connect() as conn:
+            return conn.execute('''
+                SELECT (SELECT MAX(id) FROM sessions),
+                       (SELECT MAX(id) FROM results),
+                       (SELECT MAX(completed_at) FROM sessions)
+            ''').fetchone()
+    
+    def get_sessions_since(self, since: datetime) -> List[Dict]:
+        """Возвращает сессии, созданные начиная с указанного момента (новые первыми)."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM sessions 
+                WHERE created_at >= ? 
+                ORDER BY created_at DESC
+            ''', (since,))
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
     def get_query_history(self, query: str, limit_sessions: int = 5) -> List[Dict]:
         """История позиций для запроса."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            limit = limit_sessions * 20  # примерно 20 позиций на сессию
+            history = []
+            
+            # Сначала свежие данные, архивы - только если их не хватило
+            for archive in [None] + self._archives_desc(conn):
+                try:
+                    with self._results_table(conn, archive) as table:
+                        cursor = conn.execute(f'''
+                            SELECT r.*, s.created_at 
+                            FROM {table} r
+                            JOIN sessions s ON r.session_id = s.id
+                            WHERE r.query = ?
+                            ORDER BY s.created_at DESC, r.position
+                            LIMIT ?
+                        ''', (query, limit - len(history)))
+                        history.extend(dict(row) for row in cursor.fetchall())
+                except ArchiveMissingError as e:
+                    # Остальная история важнее одного потерянного месяца
+                    self.logger.warning(str(e))
+                    continue
+                
+                if len(history) >= limit:
+                    break
+            
+            return history
+    
+    def get_domain_positions(self, domain: str, session_id: Optional[int] = None) -> List[Dict]:
+        """
+        Где ранжируется домен: (сессия, запрос, позиция) по индексу доменов.
+        
+        Args:
+            domain: домен (регистр и "www." не важны)
+            session_id: ограничить одной сессией (по умолчанию - все свежие)
+        """
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT r.*, s.created_at 
-                FROM results r
-                JOIN sessions s ON r.session_id = s.id
-                WHERE r.query = ?
-                ORDER BY s.created_at DESC, r.position
-                LIMIT ?
-            ''', (query, limit_sessions * 20))  # примерно 20 позиций на сессию
+            if session_id is None:
+                cursor.execute('''
+                    SELECT * FROM domain_index 
+                    WHERE domain = ? 
+                    ORDER BY session_id DESC, position
+                ''', (normalize_domain(domain),))
+            else:
+                cursor.execute('''
+                    SELECT * FROM domain_index 
+                    WHERE domain = ? AND session_id = ? 
+                    ORDER BY position
+                ''', (normalize_domain(domain), session_id))
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_daily_positions(self, query: str, domain: Optional[str] = None) -> List[Dict]:
+        """Дневные агрегаты (лучшая позиция за день) по архивированным сессиям."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            if domain:
+                cursor.execute('''
+                    SELECT * FROM daily_positions 
+                    WHERE query = ? AND domain = ? 
+                    ORDER BY day DESC
+                ''', (query, normalize_domain(domain)))
+            else:
+                cursor.execute('''
+                    SELECT * FROM daily_positions 
+                    WHERE query = ? 
+                    ORDER BY day DESC, best_position
+                ''', (query,))
             
             return [dict(row) for row in cursor.fetchall()]
\ No newline at end of file
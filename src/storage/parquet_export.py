@@ -0,0 +1,126 @@
+# src/storage/parquet_export.py
+"""
+Колоночная выгрузка сессий в Parquet для аналитики вне SQLite.
+
+Датасет лежит рядом с базой: data/parquet/date=YYYY-MM-DD/region=NNN/session_<id>.parquet
+(hive-разбиение). Каждая завершенная сессия выгружается один раз отдельным
+файлом, строковые колонки query и domain - словарные (dictionary-encoded).
+pyarrow импортируется только внутри методов.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+from src.storage.database import Database
+
+class ParquetStore:
+    """Инкрементальный экспорт сессий в Parquet и чтение с отсечением колонок/разделов."""
+
+    def __init__(self, settings, db: Optional[Database] = None):
+        self.settings = settings
+        self.db = db or Database(settings)
+        self.root = self.db.db_path.parent / 'parquet'
+        self.logger = logging.getLogger(__name__)
+
+    def session_path(self, session: Dict) -> Path:
+        """Путь файла сессии внутри датасета."""
+        day = str(session['created_at'])[:10]
+        return self.root / f"date={day}" / f"region={session['region']}" / f"session_{session['id']}.parquet"
+
+    def export_session(self, session_id: int) -> Optional[Path]:
+        """
+        Выгружает одну сессию (перезаписывает файл, если он уже есть).
+
+        Returns:
+            Путь к файлу или None, если сессии нет или в ней нет результатов
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        session = self.db.get_session(session_id)
+        if not session:
+            return None
+        frame = self.db.get_session_frame(session_id)
+        if not len(frame):
+            return None
+
+        rows = len(frame)
+        created_at = datetime.fromisoformat(str(session['created_at']))
+        table = pa.table({
+            'session_id': pa.array([session_id] * rows, pa.int32()),
+            'created_at': pa.array([created_at] * rows, pa.timestamp('us')),
+            # Таблицы запросов и доменов фрейма становятся словарями Parquet как есть
+            'query': pa.DictionaryArray.from_arrays(
+                pa.array(frame.query_id, pa.int32()), pa.array(frame.queries, pa.string())
+            ),
+            'position': pa.array(frame.position, pa.int16()),
+            'domain': pa.DictionaryArray.from_arrays(
+                pa.array(frame.domain_id, pa.int32()), pa.array(frame.domains, pa.string())
+            ),
+            'url': pa.array(frame.url, pa.string()),
+            'title': pa.array(frame.title, pa.string()),
+            'description': pa.array(frame.description, pa.string()),
+        })
+
+        path = self.session_path(session)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и переименовываем - читатели не видят недописанный файл.
+        # Точка в начале имени: pyarrow.dataset пропускает такие файлы при сканировании
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        pq.write_table(table, tmp_path, compression='zstd', use_dictionary=['query', 'domain'])
+        tmp_path.replace(path)
+
+        self.logger.info(f"Сессия #{session_id} выгружена в Parquet: {path} ({rows} строк)")
+        return path
+
+    def export_pending(self) -> List[int]:
+        """Выгружает все завершенные сессии, которых еще нет в датасете."""
+        exported = []
+        for session in self.db.get_completed_sessions():
+            if not self.session_path(session).exists():
+                if self.export_session(session['id']):
+                    exported.append(session['id'])
+        return exported
+
+    def read(self, columns: Optional[List[str]] = None, date_from: Optional[str] = None,
+             date_to: Optional[str] = None, regions: Optional[List[int]] = None,
+             queries: Optional[List[str]] = None, domains: Optional[List[str]] = None):
+        """
+        Читает датасет в pandas DataFrame.
+
+        Фильтры по date/region отсекают целые каталоги (разделы), columns -
+        колонки в файлах, так что годовой анализ читает только нужное.
+
+        Args:
+            columns: какие колонки читать (по умолчанию - все)
+            date_from, date_to: границы дат 'YYYY-MM-DD' включительно
+            regions: коды регионов
+            queries, domains: фильтр по значениям (проталкивается в чтение)
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        partitioning = ds.partitioning(
+            pa.schema([('date', pa.string()), ('region', pa.int32())]), flavor='hive'
+        )
+        if not self.root.exists():
+            return pa.table({}).to_pandas()
+        dataset = ds.dataset(self.root, format='parquet', partitioning=partitioning)
+
+        conditions = []
+        if date_from:
+            conditions.append(ds.field('date') >= date_from)
+        if date_to:
+            conditions.append(ds.field('date') <= date_to)
+        if regions:
+            conditions.append(ds.field('region').isin(list(regions)))
+        if queries:
+            conditions.append(ds.field('query').isin(list(queries)))
+        if domains:
+            conditions.append(ds.field('domain').isin(list(domains)))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
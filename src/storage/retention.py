@@ -0,0 +1,142 @@
+# src/storage/retention.py
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+from src.storage.database import NORMALIZED_DOMAIN_SQL, Database
+
+class RetentionManager:
+    """
+    Ротация данных SQLite-хранилища.
+
+    Завершенные сессии старше порога сворачиваются в дневные агрегаты
+    (daily_positions, домены нормализованы как в domain_index),
+    а сырые результаты переносятся в помесячные файлы data/archive/seo_YYYY_MM.db
+    (строки domain_index для них удаляются - индекс покрывает только свежие данные).
+    Строки сессий остаются в основном файле с отметкой архива, поэтому
+    чтение через Database работает прозрачно для свежих и архивных данных.
+    Незавершенные сессии не архивируются: resume дописывает их результаты
+    в основной файл, а чтение архивной сессии идет только из архива.
+    """
+
+    def __init__(self, settings, db: Optional[Database] = None):
+        self.settings = settings
+        self.db = db or Database(settings)
+        self.retention_days = getattr(settings, 'RETENTION_DAYS', 30)
+        self.logger = logging.getLogger(__name__)
+
+    def archive_old_sessions(self, older_than_days: Optional[int] = None) -> Dict:
+        """
+        Переносит сессии старше N дней в помесячные архивы.
+
+        Args:
+            older_than_days: порог в днях (по умолчанию settings.RETENTION_DAYS)
+
+        Returns:
+            Статистика: количество сессий, строк и затронутые месяцы
+        """
+        days = self.retention_days if older_than_days is None else older_than_days
+        cutoff = datetime.now() - timedelta(days=days)
+
+        with self.db.connect() as conn:
+            cursor = conn.execute('''
+                SELECT id, created_at FROM sessions
+                WHERE archive IS NULL AND completed_at IS NOT NULL AND created_at < ?
+                ORDER BY created_at
+            ''', (cutoff,))
+
+            # Группируем сессии по месяцам: '2026-01-31 ...' -> '2026_01'
+            by_month: Dict[str, List[int]] = {}
+            for session_id, created_at in cursor.fetchall():
+                month = str(created_at)[:7].replace('-', '_')
+                by_month.setdefault(month, []).append(session_id)
+
+            stats = {'sessions': 0, 'rows': 0, 'months': sorted(by_month)}
+            for month, session_ids in sorted(by_month.items()):
+                stats['rows'] += self._archive_month(conn, month, session_ids)
+                stats['sessions'] += len(session_ids)
+
+        self.logger.info(
+            f"Архивировано сессий: {stats['sessions']}, строк: {stats['rows']} "
+            f"(старше {days} дней)"
+        )
+        return stats
+
+    def _archive_month(self, conn, month: str, session_ids: List[int]) -> int:
+        """Сворачивает и переносит сессии одного месяца в его архивный файл."""
+        archive_path = self.db.archive_path(month)
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS archive_ids (id INTEGER PRIMARY KEY)')
+        conn.execute('DELETE FROM temp.archive_ids')
+        conn.executemany('INSERT INTO temp.archive_ids (id) VALUES (?)', [(i,) for i in session_ids])
+        conn.commit()
+
+        with self.db._results_table(conn, month, create=True) as archive_table:
+            cursor = conn.cursor()
+            self.db._create_results_table(cursor, schema='arch.')
+
+            # В WAL транзакция над несколькими файлами не атомарна, поэтому
+            # каждая транзакция пишет только в один файл:
+            # 1. Сырые строки - в архив. INSERT OR REPLACE: после сбоя до шага 2
+            #    повторный запуск просто перезапишет их
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {archive_table}
+                SELECT * FROM results
+                WHERE session_id IN (SELECT id FROM temp.archive_ids)
+            ''')
+            moved = cursor.rowcount
+            conn.commit()
+
+            # 2. Основной файл одной транзакцией: дневные агрегаты (лучшая позиция
+            #    домена по запросу за день), удаление строк и пометка сессий
+            cursor.execute(f'''
+                INSERT INTO daily_positions
+                (query, domain, day, region, best_position, sessions_count)
+                SELECT r.query, COALESCE({NORMALIZED_DOMAIN_SQL}, ''), date(s.created_at), s.region,
+                       MIN(r.position), COUNT(DISTINCT s.id)
+                FROM results r
+                JOIN sessions s ON r.session_id = s.id
+                WHERE r.session_id IN (SELECT id FROM temp.archive_ids)
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (query, domain, day, region) DO UPDATE SET
+                    best_position = MIN(best_position, excluded.best_position),
+                    sessions_count = sessions_count + excluded.sessions_count
+            ''')
+            cursor.execute('DELETE FROM results WHERE session_id IN (SELECT id FROM temp.archive_ids)')
+            cursor.execute('DELETE FROM domain_index WHERE session_id IN (SELECT id FROM temp.archive_ids)')
+            cursor.execute(
+                'UPDATE sessions SET archive = ? WHERE id IN (SELECT id FROM temp.archive_ids)',
+                (month,)
+            )
+            conn.commit()
+
+        self.logger.info(f"Архив {archive_path.name}: перенесено {moved} строк из {len(session_ids)} сессий")
+        return moved
+
+    def compact(self) -> Dict:
+        """
+        Онлайн-компактизация: VACUUM и ANALYZE основного файла и архивов.
+
+        Блокировка на запись держится только на время VACUUM одного файла,
+        читатели при этом продолжают работать.
+
+        Returns:
+            Размеры основного файла до и после в байтах
+        """
+        size_before = self.db.db_path.stat().st_size
+
+        archive_dir = self.db.db_path.parent / 'archive'
+        archives = sorted(archive_dir.glob('seo_*.db')) if archive_dir.exists() else []
+
+        for path in [self.db.db_path] + archives:
+            conn = sqlite3.connect(path, isolation_level=None)
+            try:
+                conn.execute('VACUUM')
+                conn.execute('ANALYZE')
+            finally:
+                conn.close()
+
+        size_after = self.db.db_path.stat().st_size
+        self.logger.info(f"Компактизация: {size_before} -> {size_after} байт, архивов: {len(archives)}")
+        return {'size_before': size_before, 'size_after': size_after, 'archives': len(archives)}
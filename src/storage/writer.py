@@ -0,0 +1,144 @@
+# src/storage/writer.py
+"""
+Отложенная запись результатов (write-behind).
+
+SQLite допускает одного писателя. Вместо того чтобы каждый поток сбора
+коммитил свой запрос и конкурировал за блокировку, производители кладут
+результаты в ограниченную очередь, а один поток-писатель выбирает их
+пачками и коммитит одной транзакцией (group commit).
+"""
+import queue
+import threading
+import time
+from typing import List, Optional
+import logging
+from src.records import SerpResult
+from src.storage.database import Database
+
+# Служебные сообщения очереди
+_STOP = object()
+
+class WriteBehindWriter:
+    """
+    Очередь записи с одним потоком-писателем.
+
+    Пачка коммитится, когда набралось batch_size запросов или с первого
+    запроса в пачке прошло flush_interval секунд. Полная очередь блокирует
+    производителя (backpressure), так что память не растет, если база
+    не успевает. Ошибка записи пробрасывается производителю при следующем
+    put/flush/close.
+
+    Использование:
+        with WriteBehindWriter(settings) as writer:
+            writer.put(session_id, query, results)
+    """
+
+    def __init__(self, settings, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_queue: Optional[int] = None):
+        self.settings = settings
+        self.batch_size = batch_size or getattr(settings, 'WRITE_BATCH_SIZE', 50)
+        self.flush_interval = flush_interval or getattr(settings, 'WRITE_FLUSH_INTERVAL', 1.0)
+        self.logger = logging.getLogger(__name__)
+
+        self._queue = queue.Queue(maxsize=max_queue or getattr(settings, 'WRITE_QUEUE_SIZE', 256))
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self.commits = 0
+        self.written = 0
+
+        self._thread = threading.Thread(target=self._run, name='seo-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Сохраняем уже полученное (resume продолжит с этого места),
+            # но не подменяем исходное исключение ошибкой записи
+            try:
+                self.close()
+            except Exception as e:
+                self.logger.error(f"Ошибка записи при аварийном завершении: {e}")
+        return False
+
+    def put(self, session_id: int, query: str, results: List[SerpResult]):
+        """Ставит результаты запроса в очередь; ждет, если очередь заполнена."""
+        self._raise_error()
+        if self._closed:
+            raise RuntimeError("WriteBehindWriter уже закрыт")
+        self._queue.put((session_id, query, results))
+
+    def flush(self):
+        """Ждет, пока все поставленное в очередь будет закоммичено."""
+        self._raise_error()
+        if self._closed:
+            # Поток-писатель остановлен - очередь никто не читает
+            raise RuntimeError("WriteBehindWriter уже закрыт")
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        self._raise_error()
+
+    def close(self):
+        """Дописывает очередь и останавливает поток-писатель."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Ошибка записи в базу: {self._error}") from self._error
+
+    def _run(self):
+        db = None
+        try:
+            # Свое соединение у потока-писателя
+            db = Database(self.settings, persistent=True)
+        except Exception as e:
+            self._error = e
+
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+
+            # Коммит по размеру, таймеру, flush или остановке
+            self._commit(db, batch)
+            batch = []
+            deadline = None
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                break
+
+        if db is not None:
+            db.close()
+
+    def _commit(self, db: Optional[Database], batch: list):
+        if not batch or self._error is not None:
+            # После ошибки очередь только вычерпывается, чтобы не блокировать производителей
+            return
+        try:
+            db.save_results_batch(batch)
+            self.commits += 1
+            self.written += len(batch)
+        except Exception as e:
+            self.logger.error(f"Не удалось записать пачку из {len(batch)} запросов: {e}", exc_info=True)
+            self._error = e
@@ -0,0 +1,53 @@
+# tests/conftest.py
+"""
+Общие фикстуры тестов: настройки с отдельной базой во временной папке
+(data/seo_data.db не трогается) и добавление сессий задним числом.
+"""
+import sys
+import sqlite3
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Добавляем корень проекта в путь для импортов
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage.database import Database
+
+@pytest.fixture
+def settings(tmp_path):
+    """Минимальные настройки; недостающие атрибуты тест задает сам (settings.X = ...)."""
+    return SimpleNamespace(
+        DATABASE_URL=f"sqlite:///{tmp_path / 'seo_data.db'}",
+        TARGET_DOMAIN='aquamoney.by',
+        COMPETITOR_DOMAINS=[],
+        MAX_RESULTS_PER_QUERY=10,
+        ensure_dirs=lambda: None,
+    )
+
+@pytest.fixture
+def db(settings):
+    return Database(settings)
+
+@pytest.fixture
+def add_session(db):
+    """
+    Добавляет сессию с заданной датой создания.
+
+    Использование:
+        session_id = add_session(created_at, {'водомат': ['a.by', 'b.by']}, region=157)
+    """
+    def add(created_at, serps, region=157, complete=True):
+        session_id = db.create_session(region=region)
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute('UPDATE sessions SET created_at = ? WHERE id = ?', (created_at, session_id))
+        for query, domains in serps.items():
+            db.save_results(session_id, query, [
+                {'position': i, 'url': f'https://{d}/', 'title': d, 'domain': d, 'description': ''}
+                for i, d in enumerate(domains, 1)
+            ])
+        if complete:
+            db.complete_session(session_id)
+        return session_id
+    return add
@@ -0,0 +1,100 @@
+# tests/test_api.py
+import asyncio
+import gzip
+import json
+import time
+
+import src.api.server as api_server
+from src.api.server import APIServer
+
+async def _get(port, path, headers=None):
+    """Простой HTTP GET: (статус, заголовки, тело)."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = [f'GET {path} HTTP/1.1', 'Host: localhost', 'Connection: close']
+    lines += [f'{k}: {v}' for k, v in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8'))
+    raw = await reader.read()
+    writer.close()
+
+    head, _, body = raw.partition(b'\r\n\r\n')
+    head_lines = head.decode('latin-1').split('\r\n')
+    status = int(head_lines[0].split()[1])
+    response_headers = {
+        name.lower(): value.strip()
+        for name, _, value in (line.partition(':') for line in head_lines[1:])
+    }
+    return status, response_headers, body
+
+def test_api_cache_etag_gzip(settings, db, monkeypatch):
+    """Кэш, 304 по ETag, gzip и сброс кэша при новой сессии."""
+    monkeypatch.setattr(api_server, 'VERSION_CHECK_INTERVAL', 0)
+    vars(settings).update(API_HOST='127.0.0.1', API_PORT=0, API_CACHE_SIZE=16)
+    first = db.create_session(region=157)
+    db.save_results(first, 'водомат', [
+        {'position': i, 'url': f'https://site{i}.by/', 'title': 'Заголовок ' * 20, 'domain': f'site{i}.by'}
+        for i in range(1, 11)
+    ])
+    db.complete_session(first)
+
+    async def scenario():
+        app = APIServer(settings, db)
+        server = await app.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, headers, body = await _get(port, '/api/sessions')
+            assert status == 200
+            assert [s['id'] for s in json.loads(body)] == [first]
+
+            status, _, _ = await _get(port, '/api/sessions', {'If-None-Match': headers['etag']})
+            assert status == 304
+
+            status, headers, body = await _get(
+                port, f'/api/sessions/{first}', {'Accept-Encoding': 'gzip'}
+            )
+            assert headers['content-encoding'] == 'gzip'
+            assert len(json.loads(gzip.decompress(body))['results']) == 10
+
+            status, _, body = await _get(port, '/api/history?query=%D0%B2%D0%BE%D0%B4%D0%BE%D0%BC%D0%B0%D1%82')
+            assert status == 200 and len(json.loads(body)) == 10
+            assert (await _get(port, '/api/history'))[0] == 400
+            status, _, body = await _get(port, '/api/domains/WWW.Site1.by')
+            assert status == 200 and json.loads(body)['domain'] == 'site1.by'
+            assert json.loads(body)['coverage']['keywords'] == 1
+            assert (await _get(port, '/api/unknown'))[0] == 404
+            assert app.cache.hits >= 1
+
+            # Новая сессия сбрасывает кэш
+            second = db.create_session(region=157)
+            status, _, body = await _get(port, '/api/sessions')
+            assert [s['id'] for s in json.loads(body)] == [second, first]
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+def test_response_computed_across_cache_reset_is_not_cached(settings, db, monkeypatch):
+    """Ответ, посчитанный по данным до сброса кэша, не попадает в кэш новой версии."""
+    monkeypatch.setattr(api_server, 'VERSION_CHECK_INTERVAL', 3600)
+    vars(settings).update(API_HOST='127.0.0.1', API_PORT=0, API_CACHE_SIZE=16)
+    app = APIServer(settings, db)
+    dispatch = app._dispatch
+
+    def slow_dispatch(path, params):
+        result = dispatch(path, params)
+        # Пока маршрут считался, сессия завершилась и кэш сбросили
+        app.cache.set_version('новая версия')
+        return result
+
+    async def scenario():
+        app._version_checked_at = time.monotonic()
+        app._dispatch = slow_dispatch
+        response = await app.get_response('/api/sessions')
+        assert response.status == 200
+        assert len(app.cache) == 0
+
+        app._dispatch = dispatch
+        await app.get_response('/api/sessions')
+        assert len(app.cache) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+# tests/test_cli.py
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Бюджет старта CLI сверх голого интерпретатора (мс)
+STARTUP_BUDGET_MS = 150
+
+HEAVY_MODULES = ('requests', 'lxml', 'pandas', 'jinja2', 'src.parser.yandex_parser')
+
+def _run(args, tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'seo_data.db'}")
+    return subprocess.run(
+        [sys.executable] + args, cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True, timeout=60
+    )
+
+def _best_time_ms(args, tmp_path, runs=3):
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = _run(args, tmp_path)
+        elapsed = (time.perf_counter() - started) * 1000
+        assert result.returncode == 0, result.stderr
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def test_fast_commands_do_not_import_heavy_modules(tmp_path):
+    """--help и status не тянут парсер, requests и библиотеки отчетов."""
+    code = (
+        "import sys\n"
+        "from src.main import main\n"
+        "main(['status'])\n"
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "assert not loaded, loaded\n"
+    )
+    result = _run(['-c', code], tmp_path)
+    assert result.returncode == 0, result.stderr
+
+def test_startup_budget(tmp_path):
+    """Старт --help укладывается в бюджет относительно `python -c pass`."""
+    baseline = _best_time_ms(['-c', 'pass'], tmp_path)
+    cli = _best_time_ms(['-m', 'src.main', '--help'], tmp_path)
+    print(f"python: {baseline:.0f} мс, CLI --help: {cli:.0f} мс")
+    assert cli - baseline < STARTUP_BUDGET_MS
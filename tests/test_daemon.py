@@ -0,0 +1,55 @@
+# tests/test_daemon.py
+from datetime import datetime
+
+import pytest
+
+from src.daemon import DaemonAlreadyRunningError, SEODaemon, next_run_time, parse_schedule, send_command
+
+def test_schedule():
+    """Расписание: ближайший запуск сегодня или завтра."""
+    times = parse_schedule('18:30, 09:00')
+    assert times == [(9, 0), (18, 30)]
+    assert next_run_time(times, datetime(2026, 1, 31, 10, 0)) == datetime(2026, 1, 31, 18, 30)
+    assert next_run_time(times, datetime(2026, 1, 31, 18, 30)) == datetime(2026, 2, 1, 9, 0)
+    assert next_run_time([], datetime(2026, 1, 31)) is None
+
+def test_trigger_does_not_queue_duplicates(tmp_path, settings):
+    """Одна и та же задача не ставится в очередь дважды."""
+    vars(settings).update(
+        XMLSTOCK_USER='', XMLSTOCK_KEY='', USER_AGENT='test',
+        DAEMON_SCHEDULE='09:00', DAEMON_SOCKET=tmp_path / 'seo_agent.sock',
+    )
+    daemon = SEODaemon(settings)
+    try:
+        assert daemon.trigger('fetch') is True
+        assert daemon.trigger('fetch') is False
+        assert daemon.trigger('report') is True
+        assert daemon.status()['pending'] == ['fetch', 'report']
+        assert daemon.handle_command('fetch')['ok'] is False
+    finally:
+        daemon.db.close()
+
+def test_second_daemon_does_not_take_over_socket(tmp_path, settings):
+    """Второй демон не перехватывает живой сокет, но заменяет оставшийся от упавшего."""
+    vars(settings).update(
+        XMLSTOCK_USER='', XMLSTOCK_KEY='', USER_AGENT='test',
+        DAEMON_SCHEDULE='09:00', DAEMON_SOCKET=tmp_path / 'seo_agent.sock',
+    )
+    first, second = SEODaemon(settings), SEODaemon(settings)
+    try:
+        first._start_control_server()
+        with pytest.raises(DaemonAlreadyRunningError):
+            second._start_control_server()
+        assert send_command(settings, 'status')['ok'] is True
+
+        # Файл сокета без слушателя - как после kill -9
+        first._server.shutdown()
+        first._server.server_close()
+        assert settings.DAEMON_SOCKET.exists()
+        second._start_control_server()
+        assert send_command(settings, 'status')['ok'] is True
+        second._server.shutdown()
+        second._server.server_close()
+    finally:
+        first.db.close()
+        second.db.close()
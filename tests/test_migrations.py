@@ -0,0 +1,26 @@
+# tests/test_migrations.py
+import sqlite3
+
+from src.storage.database import Database
+
+def test_sessions_before_completed_at_count_as_completed(tmp_path, settings):
+    """Старая база без completed_at: прежние сессии не считаются прерванными."""
+    db_path = tmp_path / 'seo_data.db'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TIMESTAMP NOT NULL,
+                region INTEGER NOT NULL,
+                search_engine TEXT DEFAULT 'yandex'
+            )
+        ''')
+        conn.execute("INSERT INTO sessions (created_at, region) VALUES ('2026-01-15 09:00:00.000001', 157)")
+
+    db = Database(settings)
+    assert db.get_incomplete_session() is None
+    assert [s['id'] for s in db.get_completed_sessions()] == [1]
+
+    # Новые сессии по-прежнему начинаются незавершенными
+    session_id = db.create_session(region=157)
+    assert db.get_incomplete_session()['id'] == session_id
@@ -0,0 +1,35 @@
+# tests/test_parquet_export.py
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from src.storage.parquet_export import ParquetStore
+
+def test_incremental_export_and_pruned_read(settings, db, add_session):
+    """Завершенные сессии выгружаются один раз и читаются с фильтрами."""
+    for created_at, region in (('2026-01-30 10:00:00.000001', 157), ('2026-01-31 10:00:00.000001', 213)):
+        add_session(created_at, {'водомат': ['aquamoney.by', 'rival.by']}, region=region)
+    db.create_session(region=157)  # незавершенная - не выгружается
+
+    store = ParquetStore(settings, db)
+    assert store.export_pending() == [1, 2]
+    assert store.export_pending() == []
+    assert (store.root / 'date=2026-01-30' / 'region=157' / 'session_1.parquet').exists()
+
+    # Недописанный файл (упавшая или идущая выгрузка) не ломает чтение
+    partition = store.root / 'date=2026-01-30' / 'region=157'
+    (partition / '.session_9.parquet.tmp').write_bytes(b'PAR1 partial')
+
+    everything = store.read()
+    assert len(everything) == 4
+
+    pruned = store.read(columns=['query', 'position'], date_from='2026-01-31')
+    assert list(pruned.columns) == ['query', 'position']
+    assert len(pruned) == 2
+
+    ours = store.read(columns=['session_id', 'position'], regions=[157], domains=['aquamoney.by'])
+    assert ours.to_dict('records') == [{'session_id': 1, 'position': 1}]
+
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(store.root / 'date=2026-01-31' / 'region=213' / 'session_2.parquet')
+    assert str(schema.field('domain').type).startswith('dictionary')
@@ -0,0 +1,86 @@
+# tests/test_queries.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from src.parser.queries import dedupe_queries, normalize_query
+from src.parser.yandex_parser import YandexParser
+
+SERP = b'''<yandexsearch><response><results><grouping>
+<group><doc><url>https://aquamoney.by/</url><domain>aquamoney.by</domain><title>A</title></doc></group>
+</grouping></results></response></yandexsearch>'''
+
+class _FakeResponse:
+    status_code = 200
+    content = SERP
+
+    def raise_for_status(self):
+        pass
+
+def _make_parser():
+    settings = SimpleNamespace(
+        XMLSTOCK_USER='user', XMLSTOCK_KEY='key', USER_AGENT='test',
+        REQUEST_DELAY=0.001, PARSER_MAX_RPS=1000,
+    )
+    parser = YandexParser(settings)
+    calls = []
+
+    def fake_get(url, params, timeout):
+        calls.append(params['query'])
+        time.sleep(0.05)
+        return _FakeResponse()
+
+    parser.session.get = fake_get
+    return parser, calls
+
+def test_normalize_and_dedupe():
+    """Регистр, ё/е и пробелы не создают отдельных запросов."""
+    assert normalize_query('  Водомат  Питьевой\tВОДЫ ') == 'водомат питьевой воды'
+    assert normalize_query('Ёмкость') == normalize_query('емкость')
+
+    unique, variants = dedupe_queries(['Водомат', 'водомат ', 'Ёлка', 'елка', '', 'вода'])
+    assert unique == ['Водомат', 'Ёлка', 'вода']
+    assert variants['водомат'] == ['Водомат', 'водомат ']
+
+def test_variants_fetched_once_and_fanned_out():
+    """Один сетевой запрос на все написания, результат у каждого написания."""
+    parser, calls = _make_parser()
+    results = parser.parse_queries(['Водомат', 'водомат', 'ВОДОМАТ '], region=157)
+
+    assert calls == ['водомат']
+    assert [r['query'] for r in results] == ['Водомат', 'водомат', 'ВОДОМАТ ']
+    assert all(r['results'][0]['domain'] == 'aquamoney.by' for r in results)
+
+def test_concurrent_identical_requests_are_coalesced():
+    """Одинаковые запросы из разных потоков делят один вызов API."""
+    parser, calls = _make_parser()
+    barrier = threading.Barrier(4)
+
+    def job():
+        barrier.wait()
+        return parser._parse_coalesced('водомат', 157)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(lambda _: job(), range(4)))
+
+    assert len(calls) == 1
+    assert all(len(out) == 1 for out in outputs)
+    assert parser.get_stats()['coalesced'] == 3
+
+def test_failing_callback_cancels_remaining_requests():
+    """Ошибка в on_result останавливает парсинг: оставшиеся запросы не тратят API."""
+    parser, calls = _make_parser()
+
+    def on_result(query_result):
+        raise RuntimeError('база недоступна')
+
+    try:
+        parser.parse_queries([f'запрос {i}' for i in range(40)], region=157, on_result=on_result)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('ошибка on_result должна пробрасываться')
+
+    time.sleep(0.2)  # уже начатые запросы завершаются
+    assert len(calls) <= 2 * parser.throttle.max_concurrency
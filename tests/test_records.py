@@ -0,0 +1,37 @@
+# tests/test_records.py
+
+from src.records import SerpResult, SessionFrame
+
+def test_serp_result_behaves_like_dict():
+    """SerpResult читается так же, как прежний словарь результата."""
+    result = SerpResult(1, 'https://aquamoney.by/', 'Водоматы', 'aquamoney.by')
+    assert result['position'] == 1
+    assert result.get('description', 'нет') == ''
+    assert result.get('missing', 'нет') == 'нет'
+    assert dict(result) == result.to_dict()
+    assert result == SerpResult.from_dict(result.to_dict())
+    assert not hasattr(result, '__dict__')
+
+def test_session_frame_roundtrip(db):
+    """Фрейм сессии из базы: общие домены, выборка по запросу, dict-вид."""
+    session_id = db.create_session(region=157)
+    for query in ('водомат', 'вода'):
+        db.save_results(session_id, query, [
+            SerpResult(i, f'https://{d}/{query}', query, d) for i, d in enumerate(['a.by', 'b.by', 'a.by'], 1)
+        ])
+
+    frame = db.get_session_frame(session_id)
+    assert len(frame) == 6
+    assert frame.queries == ['вода', 'водомат']
+    assert frame.domains == ['a.by', 'b.by']
+    assert [r.domain for r in frame.for_query('водомат', limit=2)] == ['a.by', 'b.by']
+    assert frame.for_query('нет такого') == []
+
+    as_dicts = list(frame.iter_dicts())
+    from_db = db.get_session_results(session_id)
+    assert [(d['query'], d['position'], d['url']) for d in as_dicts] == \
+        [(d['query'], d['position'], d['url']) for d in from_db]
+
+    built = SessionFrame()
+    built.append('водомат', {'position': 1, 'url': 'https://a.by/'})
+    assert built.for_query('водомат')[0]['domain'] == ''
@@ -0,0 +1,55 @@
+# tests/test_retention.py
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.storage.database import ArchiveMissingError
+from src.storage.retention import RetentionManager
+
+def test_archive_and_transparent_reads(settings, db, add_session):
+    """Старые сессии уходят в архив, но читаются как раньше."""
+    settings.RETENTION_DAYS = 30
+    old_date = (datetime.now() - timedelta(days=60)).replace(hour=10)
+
+    old_1 = add_session(old_date, {'водомат': ['a.by', 'b.by']})
+    old_2 = add_session(old_date + timedelta(hours=2), {'водомат': ['b.by', 'www.A.by']})
+    # Прерванная сессия остается в основном файле, чтобы resume дописал ее туда же
+    interrupted = add_session(old_date, {'водомат': ['a.by']}, complete=False)
+    fresh = add_session(datetime.now(), {'водомат': ['c.by', 'a.by']})
+
+    stats = RetentionManager(settings, db).archive_old_sessions()
+    assert stats['sessions'] == 2
+    assert stats['rows'] == 4
+
+    # В основном файле остались только свежие строки и прерванная сессия
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM results').fetchone()[0] == 3
+    assert db.get_session(interrupted)['archive'] is None
+    assert db.archive_path(stats['months'][0]).exists()
+
+    # Чтение сквозь архив
+    archived = db.get_session_results(old_1)
+    assert [r['domain'] for r in archived] == ['a.by', 'b.by']
+    assert len(db.get_session_results(fresh)) == 2
+    history = db.get_query_history('водомат', limit_sessions=4)
+    assert {r['session_id'] for r in history} == {old_1, old_2, interrupted, fresh}
+
+    # Дневной агрегат: лучшая позиция за день по двум сессиям
+    daily = db.get_daily_positions('водомат', 'WWW.a.by')
+    assert len(daily) == 1
+    assert daily[0]['best_position'] == 1
+    assert daily[0]['sessions_count'] == 2
+
+    # Повторный запуск ничего не переносит, компактизация не ломает данные
+    assert RetentionManager(settings, db).archive_old_sessions()['sessions'] == 0
+    RetentionManager(settings, db).compact()
+    assert len(db.get_session_results(old_2)) == 2
+
+    # Пропавший архив - понятная ошибка, а не пустой файл на его месте
+    archive_path = db.archive_path(stats['months'][0])
+    archive_path.unlink()
+    with pytest.raises(ArchiveMissingError):
+        db.get_session_results(old_1)
+    assert not archive_path.exists()
+    assert {r['session_id'] for r in db.get_query_history('водомат')} == {interrupted, fresh}
@@ -0,0 +1,76 @@
+# tests/test_similarity.py
+import numpy as np
+
+from src.analytics.similarity import (
+    METRICS, consecutive_similarity, detect_serp_updates, encode_frames,
+    SerpSimilarity, keyword_matrix, pairwise_similarity, rbo,
+)
+from src.records import SessionFrame, ValueTable
+
+def _frame(session_id, serps, url_table=None):
+    frame = SessionFrame(session_id, url_table)
+    for query, domains in serps.items():
+        for position, domain in enumerate(domains, 1):
+            frame.append(query, {'position': position, 'url': f'https://{domain}/', 'domain': domain})
+    return frame
+
+def test_encode_and_metrics():
+    frames = [
+        _frame(1, {'a': ['x.by', 'y.by', 'z.by'], 'b': ['p.by', 'q.by']}),
+        _frame(2, {'a': ['x.by', 'y.by', 'z.by']}),
+        _frame(3, {'a': ['z.by', 'y.by', 'x.by'], 'b': ['q.by', 'r.by']}),
+    ]
+    tensor = encode_frames(frames, top_n=4)
+    assert tensor.shape == (3, 2, 4)
+    assert tensor.queries == ['a', 'b'] and tensor.session_ids == [1, 2, 3]
+    assert (tensor.ids[1, 1] == -1).all()
+
+    jac = consecutive_similarity(tensor.ids, 'jaccard')
+    assert jac[0, 0] == 1.0 and jac[1, 0] == 1.0
+    assert np.isnan(jac[0, 1])      # запрос b не проверялся во 2-й сессии
+
+    rbo_scores = consecutive_similarity(tensor.ids, 'rbo')
+    assert rbo_scores[0, 0] > rbo_scores[1, 0]   # перестановка топа снижает RBO, но не Jaccard
+    assert np.isclose(rbo(np.arange(10), np.arange(10)), 1.0)
+    assert np.isclose(rbo(np.array([1, 2, -1]), np.array([1, 2, -1])), 1.0)
+
+    # Матрицы всех пар совпадают с прямым попарным сравнением
+    lists = tensor.ids.transpose(1, 0, 2)
+    for metric in ('jaccard', 'rbo'):
+        matrices = np.concatenate([m for _, m in pairwise_similarity(tensor.ids, metric, chunk=1)])
+        expected = METRICS[metric](lists[:, :, None], lists[:, None, :])
+        assert np.allclose(matrices, expected, equal_nan=True, atol=1e-6)
+        assert np.allclose(keyword_matrix(tensor.ids, 0, metric), expected[0], atol=1e-6)
+
+def test_shared_url_table_encodes_the_same():
+    """Фреймы с общей таблицей URL кодируются так же, как с отдельными."""
+    serps = [
+        {'a': ['x.by', 'y.by'], 'b': ['p.by']},
+        {'b': ['q.by', 'p.by'], 'a': ['y.by', 'z.by']},
+    ]
+    table = ValueTable()
+    shared = encode_frames([_frame(i, serp, table) for i, serp in enumerate(serps)])
+    separate = encode_frames([_frame(i, serp) for i, serp in enumerate(serps)])
+    assert (shared.ids == separate.ids).all()
+    assert shared.vocabulary == separate.vocabulary
+    assert _frame(1, serps[1], table).url == ['https://q.by/', 'https://p.by/', 'https://y.by/', 'https://z.by/']
+
+def test_detect_serp_updates():
+    rng = np.random.default_rng(1)
+    similarity = (0.9 + 0.01 * rng.standard_normal((20, 50))).astype(np.float32)
+    similarity[12] -= 0.4
+    updates = [row['index'] for row in detect_serp_updates(similarity) if row['update']]
+    assert updates == [13]
+
+def test_load_compares_completed_sessions_of_one_region(settings, db, add_session):
+    """Соседние сессии тензора - завершенные сессии одного региона."""
+    first = add_session('2026-01-01 09:00:00', {'a': ['x.by', 'y.by']})
+    add_session('2026-01-01 10:00:00', {'a': ['m.by', 'n.by']}, region=213)
+    second = add_session('2026-01-02 09:00:00', {'a': ['x.by', 'y.by']})
+    add_session('2026-01-03 09:00:00', {'a': ['z.by']}, complete=False)
+
+    similarity = SerpSimilarity(settings, db)
+    tensor = similarity.load()
+    assert tensor.session_ids == [first, second]
+    assert similarity.serp_updates()[0]['mean_similarity'] == 1.0
+    assert len(similarity.load(region=213).session_ids) == 1
@@ -0,0 +1,54 @@
+# tests/test_throttle.py
+
+from src.parser.throttle import AIMDController
+
+def _request(controller, latency=0.5, status=200, xml_error=None, error=False):
+    controller.acquire()
+    controller.release(latency, status, xml_error, error=error)
+
+def test_additive_increase_multiplicative_decrease():
+    """Быстрые ответы разгоняют лимиты, троттлинг режет их вдвое."""
+    controller = AIMDController(initial_rate=50, max_rate=100, max_concurrency=4,
+                                rate_step=10, cooldown=60)
+    for _ in range(20):
+        _request(controller)
+    grown = controller.stats()
+    assert grown['rate'] > 50
+    assert grown['concurrency'] > 1
+
+    _request(controller, xml_error=55)
+    cut = controller.stats()
+    assert cut['rate'] == round(grown['rate'] / 2, 3)
+    assert cut['throttled'] == 1
+
+    # Повторная ошибка в пределах cooldown не режет лимиты еще раз
+    _request(controller, status=429)
+    assert controller.stats()['rate'] == cut['rate']
+
+def test_slow_responses_and_errors():
+    """Медленные ответы не разгоняют, сетевые ошибки считаются отдельно."""
+    controller = AIMDController(initial_rate=50, max_rate=100, target_latency=1.0, cooldown=0)
+    _request(controller, latency=3.0)
+    assert controller.stats()['rate'] == 50
+    assert controller.stats()['increases'] == 0
+
+    _request(controller, status=None)
+    stats = controller.stats()
+    assert stats['errors'] == 1
+    assert stats['rate'] == 25
+    assert stats['in_flight'] == 0
+
+def test_client_errors_do_not_raise_limits():
+    """4xx, ошибка в XML и неразбираемый ответ - не успех, но и не перегрузка."""
+    controller = AIMDController(initial_rate=50, max_rate=100, max_concurrency=4, cooldown=0)
+    _request(controller, status=403)
+    _request(controller, xml_error=2)
+    _request(controller, error=True)
+    stats = controller.stats()
+    assert stats['errors'] == 3 and stats['successes'] == 0
+    assert stats['increases'] == 0 and stats['decreases'] == 0
+    assert stats['concurrency'] == 1 and stats['rate'] == 50
+
+    # "Нет результатов" (код 15) - нормальный ответ
+    _request(controller, xml_error=15)
+    assert controller.stats()['successes'] == 1
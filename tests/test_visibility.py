@@ -0,0 +1,68 @@
+# tests/test_visibility.py
+from src.analytics.visibility import DomainVisibility
+
+def test_domain_index_and_share_of_voice(settings, db):
+    """Индекс доменов ведется при записи, доля голоса считается по нему."""
+    settings.COMPETITOR_DOMAINS = ['rival.by']
+    session_id = db.create_session(region=157)
+
+    serps = {
+        'водомат': ['www.AquaMoney.by', 'rival.by', 'other.by'],
+        'вендинг': ['rival.by', 'aquamoney.by'],
+        'вода': ['other.by'],
+    }
+    for query, domains in serps.items():
+        db.save_results(session_id, query, [
+            {'position': i, 'url': f'https://{d}/', 'domain': d}
+            for i, d in enumerate(domains, 1)
+        ])
+
+    # Повторное сохранение запроса не дублирует индекс
+    db.save_results(session_id, 'вода', [{'position': 1, 'url': 'https://other.by/', 'domain': 'other.by'}])
+    db.complete_session(session_id)
+
+    positions = db.get_domain_positions('aquamoney.by', session_id)
+    assert [(p['query'], p['position']) for p in positions] == [('водомат', 1), ('вендинг', 2)]
+
+    visibility = DomainVisibility(settings, db)
+    coverage = visibility.coverage()
+    assert coverage['aquamoney.by']['keywords'] == 2
+    assert abs(coverage['aquamoney.by']['coverage'] - 2 / 3) < 1e-9
+    assert coverage['rival.by']['avg_position'] == 1.5
+
+    sov = visibility.share_of_voice()
+    assert abs(sum(row['share_of_voice'] for row in sov) - 1.0) < 1e-3
+    assert {row['domain'] for row in sov} == {'aquamoney.by', 'rival.by', 'other.by'}
+
+    # Адаптивная сессия: проверен только "вендинг", остальные перенесены из прошлой
+    adaptive_id = db.create_session(region=157)
+    db.save_results(adaptive_id, 'вендинг', [{'position': 1, 'url': 'https://aquamoney.by/', 'domain': 'aquamoney.by'}])
+    db.save_skipped_queries(adaptive_id, {'водомат': session_id, 'вода': session_id})
+    db.complete_session(adaptive_id)
+
+    coverage = visibility.coverage()
+    assert coverage['aquamoney.by']['keywords'] == 2
+    assert abs(coverage['aquamoney.by']['coverage'] - 2 / 3) < 1e-9
+    assert visibility.movers() == [
+        {'query': 'вендинг', 'position': 1, 'previous': 2, 'change': 1}
+    ]
+    rankings = {r['query']: r for r in visibility.domain_rankings('aquamoney.by')}
+    assert rankings['водомат']['carried'] and not rankings['вендинг']['carried']
+
+    # Сессия другого региона и недособранная сессия не подменяют сессию по умолчанию
+    other_region = db.create_session(region=213)
+    db.save_results(other_region, 'водомат', [
+        {'position': i, 'url': f'https://{d}/', 'domain': d} for i, d in enumerate(['x.by', 'y.by', 'aquamoney.by'], 1)
+    ])
+    db.complete_session(other_region)
+    partial = db.create_session(region=157)
+    db.save_results(partial, 'водомат', [{'position': 1, 'url': 'https://aquamoney.by/', 'domain': 'aquamoney.by'}])
+
+    assert visibility.coverage(region=157)['aquamoney.by']['coverage'] == coverage['aquamoney.by']['coverage']
+    assert visibility.movers(region=157) == [
+        {'query': 'вендинг', 'position': 1, 'previous': 2, 'change': 1}
+    ]
+    # Последняя сессия 213 сравнивается только с сессиями 213 - их до нее нет
+    assert visibility.movers() == [
+        {'query': 'водомат', 'position': 3, 'previous': None, 'change': None}
+    ]
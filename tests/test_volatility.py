@@ -0,0 +1,59 @@
+# tests/test_volatility.py
+from datetime import datetime, timedelta
+
+from src.analytics.volatility import RecheckScheduler
+from src.jobs import run_fetch
+from src.reporting.html_builder import HTMLBuilder
+
+class _FakeParser:
+    def parse_queries(self, queries, region, max_results, on_result=None):
+        results = []
+        for query in queries:
+            result = {'query': query, 'results': [{'position': 1, 'url': 'https://new.by/', 'domain': 'new.by'}]}
+            on_result(result)
+            results.append(result)
+        return results
+
+def test_stable_queries_are_skipped_and_carried_forward(settings, db, add_session):
+    settings.RECHECK_MAX_STALENESS_DAYS = 7
+    settings.RECHECK_VOLATILITY_THRESHOLD = 0.2
+    settings.RECHECK_WINDOW = 5
+    start = datetime.now().replace(hour=9) - timedelta(days=3)
+    for day in range(3):
+        add_session(start + timedelta(days=day), {
+            'стабильный': ['a.by', 'b.by', 'c.by'],
+            'волатильный': [f'x{day}.by', f'y{day}.by', 'c.by'],
+        })
+    last_stable = 3
+
+    scheduler = RecheckScheduler(settings, db)
+    plan = scheduler.plan(['стабильный', 'волатильный', 'новый'], 157, now=start + timedelta(days=3))
+    assert plan['due'] == ['волатильный', 'новый']
+    assert plan['skipped'] == {'стабильный': last_stable}
+    assert plan['volatility']['стабильный'] == 0.0
+
+    # История другого региона не учитывается
+    assert scheduler.plan(['стабильный'], 213, now=start + timedelta(days=3))['due'] == ['стабильный']
+
+    # Дольше максимального срока стабильный запрос не пропускается
+    stale = scheduler.plan(['стабильный'], 157, now=start + timedelta(days=10))
+    assert stale['due'] == ['стабильный']
+
+    session_id, results = run_fetch(
+        settings, ['стабильный', 'волатильный'], 157, parser=_FakeParser(), db=db, adaptive=True
+    )
+    assert [r['query'] for r in results] == ['волатильный']
+    assert db.get_skipped_queries(session_id) == {'стабильный': last_stable}
+
+    # Resume не перепроверяет пропущенные запросы
+    _, resumed = run_fetch(settings, ['стабильный', 'волатильный'], 157,
+                           parser=_FakeParser(), db=db, session_id=session_id)
+    assert resumed == []
+
+    builder = HTMLBuilder(settings, db)
+    sessions = db.get_last_sessions(limit=1)
+    table_data, carried = builder._prepare_table_data(db, sessions, ['стабильный', 'волатильный'])
+    date_key = sessions[0]['created_at']
+    assert [r['domain'] for r in table_data['стабильный'][date_key]] == ['a.by', 'b.by', 'c.by']
+    assert (('стабильный', date_key) in carried) and (('волатильный', date_key) not in carried)
+    assert 'carried-cell' in builder._build_html(sessions, ['стабильный'], table_data, carried)
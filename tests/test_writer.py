@@ -0,0 +1,41 @@
+# tests/test_writer.py
+import threading
+
+import pytest
+
+from src.records import SerpResult
+from src.storage.writer import WriteBehindWriter
+
+def test_concurrent_producers_group_commit(settings, db):
+    """Несколько потоков пишут через одну очередь без 'database is locked'."""
+    session_id = db.create_session(region=157)
+
+    with WriteBehindWriter(settings, batch_size=20, flush_interval=0.05, max_queue=8) as writer:
+        def produce(worker):
+            for i in range(25):
+                writer.put(session_id, f'запрос {worker}-{i}', [
+                    SerpResult(1, f'https://site{i}.by/', 'T', f'site{i}.by')
+                ])
+
+        threads = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        writer.flush()
+        assert writer.written == 100
+        assert writer.commits < 100  # запросы коммитятся пачками
+
+    assert len(db.get_session_queries(session_id)) == 100
+    with pytest.raises(RuntimeError):
+        writer.flush()  # после close - ошибка, а не вечное ожидание
+    assert db.get_domain_positions('site3.by', session_id)
+
+def test_write_error_reaches_producer(settings, db):
+    writer = WriteBehindWriter(settings, flush_interval=0.01)
+    writer.put(1, 'запрос', [{'position': 1}])  # нет url - запись упадет
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    with pytest.raises(RuntimeError):
+        writer.close()